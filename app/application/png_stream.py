@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import struct
+import zlib
+from typing import BinaryIO
+
+import numpy as np
+from PIL import Image
+
+_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# PNG colour type and channel count per Pillow mode.
+_COLOR_TYPES = {"L": (0, 1), "RGBA": (6, 4)}
+_FILTER_UP = 2
+
+
+class PngStreamWriter:
+    """Encode an 8-bit PNG strip by strip, so neither the raw image nor its filtered rows are held whole.
+
+    Rows use the Up filter, which vectorises across a strip and needs only the previous row as state.
+    """
+
+    def __init__(self, fp: BinaryIO, width: int, height: int, mode: str, compress_level: int = 6) -> None:
+        if mode not in _COLOR_TYPES:
+            raise ValueError(f"Unsupported PNG stream mode '{mode}'")
+        color_type, self._channels = _COLOR_TYPES[mode]
+        self._fp = fp
+        self._mode = mode
+        self._width = width
+        self._height = height
+        self._rows_written = 0
+        self._previous = np.zeros(width * self._channels, dtype=np.uint8)
+        self._compressor = zlib.compressobj(compress_level)
+
+        fp.write(_SIGNATURE)
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+
+    def write(self, strip: Image.Image) -> None:
+        if strip.mode != self._mode or strip.width != self._width:
+            raise ValueError("Strip does not match the stream's mode and width")
+        if self._rows_written + strip.height > self._height:
+            raise ValueError("More rows written than the declared height")
+
+        rows = np.asarray(strip, dtype=np.uint8).reshape(strip.height, self._width * self._channels)
+        above = np.vstack((self._previous[np.newaxis, :], rows[:-1]))
+        filtered = np.empty((strip.height, rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = _FILTER_UP
+        np.subtract(rows, above, out=filtered[:, 1:])
+
+        self._emit(self._compressor.compress(filtered.tobytes()))
+        self._previous = rows[-1].copy()
+        self._rows_written += strip.height
+
+    def close(self) -> None:
+        if self._rows_written != self._height:
+            raise ValueError(f"Expected {self._height} rows, got {self._rows_written}")
+        self._emit(self._compressor.flush())
+        self._chunk(b"IEND", b"")
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def _chunk(self, kind: bytes, data: bytes) -> None:
+        self._fp.write(struct.pack(">I", len(data)))
+        self._fp.write(kind)
+        self._fp.write(data)
+        self._fp.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind)) & 0xFFFFFFFF))
@@ -1,52 +1,500 @@
 from __future__ import annotations
 
 import io
-from dataclasses import dataclass
+import math
+from collections.abc import Callable
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass, replace
 
-from PIL import Image, ImageFilter
+from PIL import Image, ImageChops, ImageFilter, ImageOps, ImageSequence, ImageStat
+from PIL.PngImagePlugin import Blend, Disposal
 
+from app.domain.animation import is_animation
 from app.domain.background_remover import BackgroundRemover
 
+# output_format -> (file extension, content type)
+OUTPUT_FORMATS: dict[str, tuple[str, str]] = {
+    "png": ("png", "image/png"),
+    "webp": ("webp", "image/webp"),
+    "webp-lossy": ("webp", "image/webp"),
+    "mask": ("png", "image/png"),
+}
+
+# rembg encodes its result with Pillow's default PNG level; matching it lets us pass those bytes through.
+DEFAULT_PNG_COMPRESS_LEVEL = 6
+# Cached cutouts are only read back by refine jobs, so favour encode speed over size.
+SOURCE_PNG_COMPRESS_LEVEL = 1
+# The segmentation models run at 320-1024 px, so a mask predicted at this size loses nothing when
+# upsampled for very large images.
+MASK_PROXY_SIDE = 1024
+# Frames sent to the remover per predict_masks() call for animated inputs.
+ANIMATION_BATCH_FRAMES = 8
+_FRAME_SIGNATURE_SIZE = (64, 64)
+
+# Called with a stage name ("decode", "inference", "refine", "encode"); the returned context manager
+# wraps that stage. Lets the caller time stages without this layer knowing about metrics.
+StageTimer = Callable[[str], AbstractContextManager[object]]
+
+
+def _untimed(stage: str) -> AbstractContextManager[object]:  # noqa: ARG001
+    return nullcontext()
+
 
 @dataclass
 class RemoveBackgroundOptions:
     feather_radius: float = 0.0
     alpha_boost: float = 1.0
+    model: str | None = None
+    output_format: str = "png"
+    png_compress_level: int = DEFAULT_PNG_COMPRESS_LEVEL
+    webp_quality: int = 90
+    crop_to_content: bool = False
+    crop_padding: int = 0
+
+
+@dataclass
+class RemoveBackgroundResult:
+    data: bytes
+    content_type: str
+    extension: str
+    # (left, top, right, bottom) of the output within the source image when it was cropped.
+    crop_box: tuple[int, int, int, int] | None = None
+    pixels_removed: int = 0
+    # The unrefined cutout (raw mask as alpha) the output was derived from; see refine_cutout().
+    source: bytes | None = None
+    frames: int = 1
+    frames_inferred: int = 1
 
 
 class RemoveBackgroundUseCase:
-    def __init__(self, remover: BackgroundRemover) -> None:
+    def __init__(
+        self,
+        remover: BackgroundRemover,
+        large_image_pixels: int = 0,
+        strip_rows: int = 256,
+        frame_reuse_threshold: float = 0.0,
+        stage_timer: StageTimer | None = None,
+    ) -> None:
         self._remover = remover
+        self._timer = stage_timer or _untimed
+        # Images above this many pixels are composed and encoded strip by strip; 0 disables it.
+        self._large_image_pixels = large_image_pixels
+        self._strip_rows = max(1, strip_rows)
+        # Animation frames whose mean grey-level difference from the last inferred frame stays at or
+        # below this reuse its mask; 0 runs inference on every frame.
+        self._frame_reuse_threshold = frame_reuse_threshold
+
+    def execute(self, image_bytes: bytes, options: RemoveBackgroundOptions | None = None) -> RemoveBackgroundResult:
+        opts = _checked_options(image_bytes, options)
+        if _is_animated(image_bytes):
+            return self._execute_animated(image_bytes, opts)
+        if self._is_large(image_bytes):
+            return self._execute_tiled(image_bytes, opts)
+        with self._timer("inference"):
+            cutout = self._remover.remove(image_bytes, opts.model)
+        return refine_cutout(cutout, opts, self._timer)
+
+    def execute_progressive(
+        self,
+        image_bytes: bytes,
+        options: RemoveBackgroundOptions | None,
+        preview_max_side: int,
+        on_preview: Callable[[RemoveBackgroundResult], None],
+    ) -> RemoveBackgroundResult:
+        """Like :meth:`execute`, but hand a small preview to ``on_preview`` before the full result.
+
+        The preview comes from a quick inference on a proxy no larger than ``preview_max_side``; the
+        final result then runs the normal full inference, so its quality matches a job without a
+        preview. Only large (tiled) images reuse one mask for both, as their final mask is predicted
+        on a proxy anyway.
+        """
+        opts = _checked_options(image_bytes, options)
+        if _is_animated(image_bytes):
+            return self._execute_animated(image_bytes, opts)
+        if self._is_large(image_bytes):
+            return self._execute_tiled(image_bytes, opts, preview_max_side, on_preview)
+
+        with Image.open(io.BytesIO(image_bytes)) as header:
+            if max(header.size) <= preview_max_side:
+                return self.execute(image_bytes, opts)
+
+        with self._timer("decode"):
+            image = _open_upright(image_bytes)
+        with self._timer("inference"):
+            proxy = _proxy(image, preview_max_side)
+            mask = self._remover.predict_mask(proxy, opts.model)
+        on_preview(_preview_result(proxy, mask, opts, proxy.width / image.width, self._timer))
+        # Drop the decoded original before execute() decodes it again.
+        del image, proxy, mask
+        return self.execute(image_bytes, opts)
+
+    def _execute_animated(self, image_bytes: bytes, options: RemoveBackgroundOptions) -> RemoveBackgroundResult:
+        """Cut out every frame of an animated GIF/WebP/APNG and re-encode it as an animation.
+
+        Frames that barely differ from the last inferred one reuse its mask, which skips inference on
+        static stretches; the rest go to the remover in batches of ``ANIMATION_BATCH_FRAMES``.
+        """
+        with self._timer("decode"), Image.open(io.BytesIO(image_bytes)) as animation:
+            loop = int(animation.info.get("loop", 0))
+            frames: list[Image.Image] = []
+            durations: list[int] = []
+            for frame in ImageSequence.Iterator(animation):
+                frames.append(frame.convert("RGBA"))
+                durations.append(int(frame.info.get("duration") or 100))
+
+        mask_source: list[int] = []
+        inferred: list[int] = []
+        reference = None
+        for index, frame in enumerate(frames):
+            signature = frame.convert("L").resize(_FRAME_SIGNATURE_SIZE, Image.Resampling.BILINEAR)
+            if reference is None or _mean_difference(signature, reference) > self._frame_reuse_threshold:
+                inferred.append(index)
+                reference = signature
+            mask_source.append(inferred[-1])
 
-    def execute(self, image_bytes: bytes, options: RemoveBackgroundOptions | None = None) -> bytes:
-        if not image_bytes:
-            raise ValueError("Uploaded file is empty")
+        masks: dict[int, Image.Image] = {}
+        with self._timer("inference"):
+            for start in range(0, len(inferred), ANIMATION_BATCH_FRAMES):
+                batch = inferred[start : start + ANIMATION_BATCH_FRAMES]
+                masks.update(zip(batch, self._remover.predict_masks([frames[i] for i in batch], options.model)))
 
-        opts = options or RemoveBackgroundOptions()
-        output_png = self._remover.remove(image_bytes)
-        return self._refine_alpha(output_png, opts)
+        with self._timer("refine"):
+            cutouts = [
+                _refine_alpha(_compose_cutout(frame, masks[mask_source[index]]), options)
+                for index, frame in enumerate(frames)
+            ]
+            crop_box = _union_content_box(cutouts, options) if options.crop_to_content else None
+            pixels_removed = 0
+            if crop_box is not None:
+                pixels_removed = (cutouts[0].width * cutouts[0].height - _box_area(crop_box)) * len(cutouts)
+                cutouts = [cutout.crop(crop_box) for cutout in cutouts]
 
-    def _refine_alpha(self, png_bytes: bytes, options: RemoveBackgroundOptions) -> bytes:
-        needs_refine = options.feather_radius > 0 or abs(options.alpha_boost - 1.0) > 1e-3
-        if not needs_refine:
-            return png_bytes
+        extension, content_type = OUTPUT_FORMATS[options.output_format]
+        with self._timer("encode"):
+            data = _encode_animation(cutouts, durations, loop, options)
+        return RemoveBackgroundResult(
+            data,
+            content_type,
+            extension,
+            crop_box,
+            pixels_removed,
+            frames=len(frames),
+            frames_inferred=len(inferred),
+        )
 
-        with Image.open(io.BytesIO(png_bytes)) as image:
-            rgba = image.convert("RGBA")
-            alpha = rgba.getchannel("A")
+    def _is_large(self, image_bytes: bytes) -> bool:
+        if self._large_image_pixels <= 0:
+            return False
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            return image.width * image.height > self._large_image_pixels
 
-            if options.feather_radius > 0:
-                alpha = alpha.filter(ImageFilter.GaussianBlur(radius=options.feather_radius))
+    def _execute_tiled(
+        self,
+        image_bytes: bytes,
+        options: RemoveBackgroundOptions,
+        preview_max_side: int = 0,
+        on_preview: Callable[[RemoveBackgroundResult], None] | None = None,
+    ) -> RemoveBackgroundResult:
+        """Large-image path: only the decoded input is ever held at full size.
 
-            if abs(options.alpha_boost - 1.0) > 1e-3:
-                boost = max(0.4, min(2.5, options.alpha_boost))
-                alpha = alpha.point(
-                    lambda value: int(
-                        max(0, min(255, ((value / 255.0 - 0.5) * boost + 0.5) * 255))
-                    )
+        The mask is predicted on a proxy and upsampled one strip at a time (with enough overlap for
+        the feather blur to match the whole-image result); PNG and mask outputs are encoded as the
+        strips are produced. No cutout is cached for refine jobs, since that would mean a second
+        full-size encode.
+        """
+        with self._timer("decode"):
+            image = _open_upright(image_bytes)
+        with self._timer("inference"):
+            proxy = _proxy(image, MASK_PROXY_SIDE)
+            mask = self._remover.predict_mask(proxy, options.model)
+        if on_preview is not None:
+            small = _proxy(proxy, preview_max_side)
+            on_preview(
+                _preview_result(small, mask.resize(small.size), options, small.width / image.width, self._timer)
+            )
+
+        crop_box = _proxy_content_box(mask, image.size, options) if options.crop_to_content else None
+        left, top, right, bottom = crop_box or (0, 0, image.width, image.height)
+        width, height = right - left, bottom - top
+        scale_x, scale_y = mask.width / image.width, mask.height / image.height
+        margin = math.ceil(options.feather_radius * 3) + 2 if options.feather_radius > 0 else 0
+
+        # Imported here: numpy is only needed on this path, and the API process imports this module.
+        from app.application.png_stream import PngStreamWriter
+
+        alpha_only = options.output_format == "mask"
+        output = io.BytesIO()
+        writer = None
+        assembled = None
+        if options.output_format in {"png", "mask"}:
+            writer = PngStreamWriter(output, width, height, "L" if alpha_only else "RGBA", options.png_compress_level)
+        else:
+            # Pillow has no incremental WebP encoder, so WebP still needs the full cutout.
+            assembled = Image.new("RGBA", (width, height))
+
+        for y0 in range(top, bottom, self._strip_rows):
+            y1 = min(bottom, y0 + self._strip_rows)
+            above, below = max(0, y0 - margin), min(image.height, y1 + margin)
+            with self._timer("refine"):
+                raw = mask.resize(
+                    (width, below - above),
+                    Image.Resampling.BILINEAR,
+                    box=(left * scale_x, above * scale_y, right * scale_x, below * scale_y),
                 )
+                rows = (0, y0 - above, width, y1 - above)
+                alpha = _refine_mask(raw, options).crop(rows)
+                if alpha_only:
+                    strip = alpha
+                else:
+                    strip = _compose_cutout(image.crop((left, y0, right, y1)), raw.crop(rows))
+                    strip.putalpha(alpha)
+            if writer is not None:
+                with self._timer("encode"):
+                    writer.write(strip)
+            else:
+                assembled.paste(strip, (0, y0 - top))
+
+        with self._timer("encode"):
+            if writer is not None:
+                writer.close()
+                data = output.getvalue()
+            else:
+                data = encode_cutout(assembled, options)
+
+        extension, content_type = OUTPUT_FORMATS[options.output_format]
+        pixels_removed = image.width * image.height - width * height
+        return RemoveBackgroundResult(data, content_type, extension, crop_box, pixels_removed)
+
+
+def _checked_options(image_bytes: bytes, options: RemoveBackgroundOptions | None) -> RemoveBackgroundOptions:
+    if not image_bytes:
+        raise ValueError("Uploaded file is empty")
+    opts = options or RemoveBackgroundOptions()
+    if opts.output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{opts.output_format}'")
+    return opts
+
+
+def _is_animated(image_bytes: bytes) -> bool:
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return is_animation(image)
+
+
+def _mean_difference(first: Image.Image, second: Image.Image) -> float:
+    return ImageStat.Stat(ImageChops.difference(first, second)).mean[0]
+
+
+def _box_area(box: tuple[int, int, int, int]) -> int:
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _union_content_box(
+    frames: list[Image.Image], options: RemoveBackgroundOptions
+) -> tuple[int, int, int, int] | None:
+    # One box for the whole animation, so frames keep their relative placement.
+    boxes = [box for box in (frame.getchannel("A").getbbox() for frame in frames) if box is not None]
+    if not boxes:
+        return None
+    width, height = frames[0].size
+    padding = max(0, options.crop_padding)
+    box = (
+        max(0, min(box[0] for box in boxes) - padding),
+        max(0, min(box[1] for box in boxes) - padding),
+        min(width, max(box[2] for box in boxes) + padding),
+        min(height, max(box[3] for box in boxes) + padding),
+    )
+    if box == (0, 0, width, height):
+        return None
+    return box
+
+
+def _encode_animation(
+    frames: list[Image.Image], durations: list[int], loop: int, options: RemoveBackgroundOptions
+) -> bytes:
+    output = io.BytesIO()
+    if options.output_format == "mask":
+        frames = [frame.getchannel("A") for frame in frames]
+    first, rest = frames[0], frames[1:]
+    if options.output_format == "webp":
+        first.save(
+            output, format="WEBP", save_all=True, append_images=rest, duration=durations, loop=loop,
+            lossless=True, method=4,
+        )
+    elif options.output_format == "webp-lossy":
+        first.save(
+            output, format="WEBP", save_all=True, append_images=rest, duration=durations, loop=loop,
+            quality=options.webp_quality, alpha_quality=100, method=4,
+        )
+    else:
+        # APNG; clear each frame before drawing the next so transparent areas do not show the previous one.
+        # Opaque mask frames overwrite each other anyway.
+        disposal = Disposal.OP_NONE if options.output_format == "mask" else Disposal.OP_BACKGROUND
+        first.save(
+            output, format="PNG", save_all=True, append_images=rest, duration=durations, loop=loop,
+            disposal=disposal, blend=Blend.OP_SOURCE, compress_level=options.png_compress_level,
+        )
+    return output.getvalue()
+
+
+def _open_upright(image_bytes: bytes) -> Image.Image:
+    # rembg applies the EXIF orientation too; transposing in place avoids a second full-size copy.
+    image = Image.open(io.BytesIO(image_bytes))
+    image.load()
+    ImageOps.exif_transpose(image, in_place=True)
+    return image
+
+
+def _proxy(image: Image.Image, max_side: int) -> Image.Image:
+    scale = min(1.0, max_side / max(image.size))
+    size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+    return image.resize(size, Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+
+def _preview_result(
+    proxy: Image.Image,
+    mask: Image.Image,
+    options: RemoveBackgroundOptions,
+    scale: float,
+    timer: StageTimer = _untimed,
+) -> RemoveBackgroundResult:
+    preview_opts = replace(
+        options,
+        feather_radius=options.feather_radius * scale,
+        output_format="mask" if options.output_format == "mask" else "png",
+        png_compress_level=SOURCE_PNG_COMPRESS_LEVEL,
+        crop_to_content=False,
+    )
+    return _finish_cutout(_compose_cutout(proxy, mask), preview_opts, timer=timer)
+
+
+def _proxy_content_box(
+    mask: Image.Image, size: tuple[int, int], options: RemoveBackgroundOptions
+) -> tuple[int, int, int, int] | None:
+    """Content box measured on the proxy mask, widened by one proxy pixel so upsampling cannot clip it."""
+    width, height = size
+    scale_x, scale_y = mask.width / width, mask.height / height
+    box = _refine_mask(mask, replace(options, feather_radius=options.feather_radius * scale_x)).getbbox()
+    if box is None:
+        return None
+    padding = max(0, options.crop_padding)
+    box = (
+        max(0, math.floor((box[0] - 1) / scale_x) - padding),
+        max(0, math.floor((box[1] - 1) / scale_y) - padding),
+        min(width, math.ceil((box[2] + 1) / scale_x) + padding),
+        min(height, math.ceil((box[3] + 1) / scale_y) + padding),
+    )
+    if box == (0, 0, width, height):
+        return None
+    return box
+
+
+def refine_cutout(
+    cutout_png: bytes, options: RemoveBackgroundOptions, timer: StageTimer = _untimed
+) -> RemoveBackgroundResult:
+    """Apply the post-inference options to an unrefined cutout.
+
+    The cutout carries the raw model mask as its alpha channel, so re-running this with new
+    options gives the same output as a fresh job without paying for inference again.
+    """
+    if options.output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format '{options.output_format}'")
+    extension, content_type = OUTPUT_FORMATS[options.output_format]
+
+    if _is_passthrough(options):
+        return RemoveBackgroundResult(cutout_png, content_type, extension, source=cutout_png)
+
+    with timer("decode"), Image.open(io.BytesIO(cutout_png)) as image:
+        rgba = image.convert("RGBA")
+    return _finish_cutout(rgba, options, cutout_png, timer)
+
+
+def _compose_cutout(image: Image.Image, mask: Image.Image) -> Image.Image:
+    # Same compositing as rembg's naive cutout, so both paths produce identical pixels for a given mask.
+    return Image.composite(image, Image.new("RGBA", image.size, 0), mask)
+
+
+def _finish_cutout(
+    rgba: Image.Image,
+    options: RemoveBackgroundOptions,
+    source: bytes | None = None,
+    timer: StageTimer = _untimed,
+) -> RemoveBackgroundResult:
+    extension, content_type = OUTPUT_FORMATS[options.output_format]
+    with timer("refine"):
+        rgba = _refine_alpha(rgba, options)
+        crop_box = _content_box(rgba, options) if options.crop_to_content else None
+        pixels_removed = 0
+        if crop_box is not None:
+            pixels_removed = rgba.width * rgba.height
+            rgba = rgba.crop(crop_box)
+            pixels_removed -= rgba.width * rgba.height
+    with timer("encode"):
+        data = encode_cutout(rgba, options)
+    return RemoveBackgroundResult(data, content_type, extension, crop_box, pixels_removed, source=source)
+
+
+def _needs_refine(options: RemoveBackgroundOptions) -> bool:
+    return options.feather_radius > 0 or abs(options.alpha_boost - 1.0) > 1e-3
+
+
+def _is_passthrough(options: RemoveBackgroundOptions) -> bool:
+    return (
+        options.output_format == "png"
+        and options.png_compress_level == DEFAULT_PNG_COMPRESS_LEVEL
+        and not _needs_refine(options)
+        and not options.crop_to_content
+    )
+
+
+def _content_box(rgba: Image.Image, options: RemoveBackgroundOptions) -> tuple[int, int, int, int] | None:
+    """Bounding box of the non-transparent pixels grown by ``crop_padding``; None if nothing to trim."""
+    box = rgba.getchannel("A").getbbox()
+    if box is None:
+        return None
+    padding = max(0, options.crop_padding)
+    left, top, right, bottom = box
+    box = (
+        max(0, left - padding),
+        max(0, top - padding),
+        min(rgba.width, right + padding),
+        min(rgba.height, bottom + padding),
+    )
+    if box == (0, 0, rgba.width, rgba.height):
+        return None
+    return box
+
+
+def _refine_alpha(rgba: Image.Image, options: RemoveBackgroundOptions) -> Image.Image:
+    if not _needs_refine(options):
+        return rgba
+    rgba.putalpha(_refine_mask(rgba.getchannel("A"), options))
+    return rgba
+
+
+def _refine_mask(alpha: Image.Image, options: RemoveBackgroundOptions) -> Image.Image:
+    if options.feather_radius > 0:
+        alpha = alpha.filter(ImageFilter.GaussianBlur(radius=options.feather_radius))
+
+    if abs(options.alpha_boost - 1.0) > 1e-3:
+        boost = max(0.4, min(2.5, options.alpha_boost))
+        alpha = alpha.point(
+            lambda value: int(
+                max(0, min(255, ((value / 255.0 - 0.5) * boost + 0.5) * 255))
+            )
+        )
+
+    return alpha
+
 
-            rgba.putalpha(alpha)
-            output = io.BytesIO()
-            rgba.save(output, format="PNG")
-            return output.getvalue()
+def encode_cutout(rgba: Image.Image, options: RemoveBackgroundOptions) -> bytes:
+    """Encode a finished RGBA cutout in ``options.output_format``; scripts/benchmark_encoders.py times this."""
+    output = io.BytesIO()
+    if options.output_format == "mask":
+        rgba.getchannel("A").save(output, format="PNG", compress_level=options.png_compress_level)
+    elif options.output_format == "webp":
+        rgba.save(output, format="WEBP", lossless=True, method=4)
+    elif options.output_format == "webp-lossy":
+        rgba.save(output, format="WEBP", quality=options.webp_quality, alpha_quality=100, method=4)
+    else:
+        rgba.save(output, format="PNG", compress_level=options.png_compress_level)
+    return output.getvalue()
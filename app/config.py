@@ -15,12 +15,25 @@ class Settings:
     s3_bucket: str = os.getenv("S3_BUCKET", "rmbg-assets")
     s3_secure: bool = os.getenv("S3_SECURE", "false").lower() == "true"
     s3_addressing_style: str = os.getenv("S3_ADDRESSING_STYLE", "path")
+    s3_max_pool_connections: int = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+    s3_max_attempts: int = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+    s3_retry_mode: str = os.getenv("S3_RETRY_MODE", "standard")
+    s3_tcp_keepalive: bool = os.getenv("S3_TCP_KEEPALIVE", "true").lower() == "true"
+    s3_connect_timeout_seconds: float = float(os.getenv("S3_CONNECT_TIMEOUT_SECONDS", "5"))
+    s3_read_timeout_seconds: float = float(os.getenv("S3_READ_TIMEOUT_SECONDS", "60"))
+    s3_multipart_threshold_mb: int = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16"))
+    s3_multipart_chunksize_mb: int = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "8"))
+    s3_transfer_concurrency: int = int(os.getenv("S3_TRANSFER_CONCURRENCY", "8"))
 
     signed_url_ttl_seconds: int = int(os.getenv("SIGNED_URL_TTL_SECONDS", "3600"))
-    max_image_bytes: int = int(os.getenv("MAX_IMAGE_BYTES", str(12 * 1024 * 1024)))
+    max_image_bytes: int = int(os.getenv("MAX_IMAGE_BYTES", str(40 * 1024 * 1024)))
     max_batch_files: int = int(os.getenv("MAX_BATCH_FILES", "15"))
     rate_limit_per_minute: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "45"))
-    max_image_pixels: int = int(os.getenv("MAX_IMAGE_PIXELS", str(20_000_000)))
+    max_image_pixels: int = int(os.getenv("MAX_IMAGE_PIXELS", str(100_000_000)))
+    large_image_pixels: int = int(os.getenv("LARGE_IMAGE_PIXELS", str(16_000_000)))
+    tile_rows: int = int(os.getenv("TILE_ROWS", "256"))
+    max_animation_frames: int = int(os.getenv("MAX_ANIMATION_FRAMES", "300"))
+    animation_reuse_threshold: float = float(os.getenv("ANIMATION_REUSE_THRESHOLD", "1.5"))
 
     job_result_ttl_seconds: int = int(os.getenv("JOB_RESULT_TTL_SECONDS", "86400"))
     job_failure_ttl_seconds: int = int(os.getenv("JOB_FAILURE_TTL_SECONDS", "86400"))
@@ -28,6 +41,24 @@ class Settings:
     job_retry_intervals: tuple[int, ...] = tuple(
         int(x.strip()) for x in os.getenv("JOB_RETRY_INTERVALS", "5,20").split(",") if x.strip()
     )
+    sync_inference_enabled: bool = os.getenv("SYNC_INFERENCE_ENABLED", "true").lower() == "true"
+    sync_max_pixels: int = int(os.getenv("SYNC_MAX_PIXELS", str(1_000_000)))
+    sync_pool_workers: int = int(os.getenv("SYNC_POOL_WORKERS", "2"))
+    sync_pool_backlog: int = int(os.getenv("SYNC_POOL_BACKLOG", "2"))
+    # 0 splits the cores evenly across every sync pool thread of every API process on the host.
+    sync_onnx_threads: int = int(os.getenv("SYNC_ONNX_THREADS", "0"))
+    api_processes: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    dedup_enabled: bool = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    dedup_ttl_seconds: int = int(os.getenv("DEDUP_TTL_SECONDS", "1800"))
+    dedup_claim_grace_seconds: int = int(os.getenv("DEDUP_CLAIM_GRACE_SECONDS", "10"))
+    preview_max_side: int = int(os.getenv("PREVIEW_MAX_SIDE", "512"))
+    refine_cache_enabled: bool = os.getenv("REFINE_CACHE_ENABLED", "true").lower() == "true"
+    metrics_shared_enabled: bool = os.getenv("METRICS_SHARED_ENABLED", "true").lower() == "true"
+    metrics_flush_interval_seconds: float = float(os.getenv("METRICS_FLUSH_INTERVAL_SECONDS", "5"))
+    queue_stats_cache_seconds: float = float(os.getenv("QUEUE_STATS_CACHE_SECONDS", "5"))
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
 
     cleanup_enabled: bool = os.getenv("CLEANUP_ENABLED", "true").lower() == "true"
     cleanup_interval_seconds: int = int(os.getenv("CLEANUP_INTERVAL_SECONDS", "900"))
@@ -35,7 +66,41 @@ class Settings:
     cleanup_prefixes: tuple[str, ...] = tuple(
         x.strip() for x in os.getenv("CLEANUP_PREFIXES", "jobs/single/,jobs/batch/").split(",") if x.strip()
     )
+    cleanup_reconcile_interval_seconds: int = int(os.getenv("CLEANUP_RECONCILE_INTERVAL_SECONDS", "86400"))
+    cleanup_leader_lease_seconds: int = int(os.getenv("CLEANUP_LEADER_LEASE_SECONDS", "90"))
+    cleanup_delete_concurrency: int = int(os.getenv("CLEANUP_DELETE_CONCURRENCY", "4"))
     worker_concurrency: int = int(os.getenv("WORKER_CONCURRENCY", "1"))
+    worker_min_processes: int = int(os.getenv("WORKER_MIN_PROCESSES", str(worker_concurrency)))
+    worker_max_processes: int = int(os.getenv("WORKER_MAX_PROCESSES", str(worker_concurrency)))
+    worker_jobs_per_process: int = int(os.getenv("WORKER_JOBS_PER_PROCESS", "2"))
+    worker_cpu_headroom: float = float(os.getenv("WORKER_CPU_HEADROOM", "0.15"))
+    worker_max_rss_mb: int = int(os.getenv("WORKER_MAX_RSS_MB", "0"))
+    worker_scale_interval_seconds: int = int(os.getenv("WORKER_SCALE_INTERVAL_SECONDS", "10"))
+    worker_drain_timeout_seconds: int = int(os.getenv("WORKER_DRAIN_TIMEOUT_SECONDS", "300"))
+    worker_cpu_affinity: bool = os.getenv("WORKER_CPU_AFFINITY", "false").lower() == "true"
+
+    worker_in_process: bool = os.getenv("WORKER_IN_PROCESS", "true").lower() == "true"
+    worker_model_lanes: tuple[str, ...] = tuple(
+        x.strip() for x in os.getenv("WORKER_MODEL_LANES", "").split(",") if x.strip()
+    )
+
+    rembg_default_model: str = os.getenv("REMBG_DEFAULT_MODEL", "u2net")
+    rembg_models: tuple[str, ...] = tuple(
+        x.strip()
+        for x in os.getenv("REMBG_MODELS", "u2net,u2netp,isnet-general-use,u2net_human_seg").split(",")
+        if x.strip()
+    )
+    model_cache_max_mb: int = int(os.getenv("MODEL_CACHE_MAX_MB", "1024"))
+    rembg_model_variant: str = os.getenv("REMBG_MODEL_VARIANT", "fp32").lower()
+    rembg_variant_dir: str = os.getenv("REMBG_VARIANT_DIR", "")
+    model_lanes: tuple[str, ...] = tuple(x.strip() for x in os.getenv("MODEL_LANES", "").split(",") if x.strip())
+
+    onnx_intra_op_threads: int = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+    onnx_inter_op_threads: int = int(os.getenv("ONNX_INTER_OP_THREADS", "0"))
+    onnx_execution_mode: str = os.getenv("ONNX_EXECUTION_MODE", "sequential").lower()
+    onnx_graph_optimization: str = os.getenv("ONNX_GRAPH_OPTIMIZATION", "all").lower()
+    onnx_enable_cpu_mem_arena: bool = os.getenv("ONNX_ENABLE_CPU_MEM_ARENA", "true").lower() == "true"
+    onnx_enable_mem_pattern: bool = os.getenv("ONNX_ENABLE_MEM_PATTERN", "true").lower() == "true"
 
 
 settings = Settings()
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from PIL import Image
+
+# Container formats whose extra frames are animation frames rather than alternate views or pages.
+ANIMATED_FORMATS = frozenset({"GIF", "PNG", "WEBP"})
+
+
+def is_animation(image: Image.Image) -> bool:
+    """True for animated GIF/APNG/WebP only.
+
+    Other multi-frame files (MPO photos from phones and dual cameras, multi-page TIFFs) are stills
+    whose first frame is the picture.
+    """
+    return bool(getattr(image, "is_animated", False)) and image.format in ANIMATED_FORMATS
+
+
+def frame_count(image: Image.Image) -> int:
+    """Frames that will be processed: every frame of an animation, otherwise just the first."""
+    return getattr(image, "n_frames", 1) if is_animation(image) else 1
@@ -1,9 +1,34 @@
 from __future__ import annotations
 
+import io
 from abc import ABC, abstractmethod
 
+from PIL import Image
+
 
 class BackgroundRemover(ABC):
     @abstractmethod
-    def remove(self, image_bytes: bytes) -> bytes:
-        """Return processed PNG bytes with background removed."""
+    def remove(self, image_bytes: bytes, model_name: str | None = None) -> bytes:
+        """Return processed PNG bytes with background removed.
+
+        ``model_name`` selects the segmentation model; ``None`` means the remover's default.
+        """
+
+    def predict_mask(self, image: Image.Image, model_name: str | None = None) -> Image.Image:
+        """Return the foreground mask for ``image`` as an ``L`` image of the same size.
+
+        The default derives it from :meth:`remove`; implementations with direct model access should
+        override it to skip the cutout and PNG round trip.
+        """
+        buffer = io.BytesIO()
+        image.save(buffer, format="PNG")
+        with Image.open(io.BytesIO(self.remove(buffer.getvalue(), model_name))) as cutout:
+            return cutout.convert("RGBA").getchannel("A")
+
+    def predict_masks(self, images: list[Image.Image], model_name: str | None = None) -> list[Image.Image]:
+        """Masks for several images, e.g. the frames of an animation.
+
+        Implementations whose model accepts a batch dimension can override this; the default runs
+        :meth:`predict_mask` per image on the same warm session.
+        """
+        return [self.predict_mask(image, model_name) for image in images]
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import hashlib
+
+from redis import Redis
+
+# Claims are stored as "<job_id>|<claimed at, Redis server seconds>" so callers can tell a claim
+# whose job is still being enqueued from one whose job has vanished.
+
+# Claim the fingerprint for ARGV[1] unless someone holds it; returns the stored claim either way.
+_CLAIM_SCRIPT = """
+local current = redis.call("get", KEYS[1])
+if current then
+    return current
+end
+local claim = ARGV[1] .. "|" .. redis.call("time")[1]
+redis.call("set", KEYS[1], claim, "EX", ARGV[2])
+return claim
+"""
+
+# Claim the fingerprint for ARGV[2] when it is free, or still held by the stale owner ARGV[1] for at
+# least ARGV[4] seconds; returns the stored claim.
+_TAKEOVER_SCRIPT = """
+local now = tonumber(redis.call("time")[1])
+local current = redis.call("get", KEYS[1])
+if current then
+    local sep = string.find(current, "|", 1, true)
+    local owner = sep and string.sub(current, 1, sep - 1) or current
+    local claimed_at = sep and tonumber(string.sub(current, sep + 1)) or 0
+    if owner ~= ARGV[1] or now - claimed_at < tonumber(ARGV[4]) then
+        return current
+    end
+end
+local claim = ARGV[2] .. "|" .. now
+redis.call("set", KEYS[1], claim, "EX", ARGV[3])
+return claim
+"""
+
+# Only the owning job may drop its claim; a newer owner must not be released by an old job.
+_RELEASE_SCRIPT = """
+local current = redis.call("get", KEYS[1])
+if current and (current == ARGV[1] or string.sub(current, 1, #ARGV[1] + 1) == ARGV[1] .. "|") then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def submission_fingerprint(*parts: bytes | str | float) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        chunk = part if isinstance(part, bytes) else repr(part).encode("utf-8")
+        digest.update(len(chunk).to_bytes(8, "big"))
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class InFlightRegistry:
+    """Maps submission fingerprints to the job currently computing them."""
+
+    def __init__(self, connection: Redis, ttl_seconds: int, prefix: str = "rmbg:inflight:") -> None:
+        self._connection = connection
+        self._ttl_seconds = max(1, ttl_seconds)
+        self._prefix = prefix
+        self._claim = connection.register_script(_CLAIM_SCRIPT)
+        self._takeover = connection.register_script(_TAKEOVER_SCRIPT)
+        self._release = connection.register_script(_RELEASE_SCRIPT)
+
+    def _key(self, fingerprint: str) -> str:
+        return f"{self._prefix}{fingerprint}"
+
+    def claim(self, fingerprint: str, job_id: str) -> str:
+        """Return the owning job id; it equals ``job_id`` when this caller won the claim."""
+        return _owner(self._claim(keys=[self._key(fingerprint)], args=[job_id, self._ttl_seconds]))
+
+    def takeover(self, fingerprint: str, stale_job_id: str, job_id: str, min_age_seconds: int = 0) -> str:
+        """Replace ``stale_job_id`` as owner once its claim is at least ``min_age_seconds`` old.
+
+        Returns the owner afterwards; it is still ``stale_job_id`` while that claim is too young.
+        """
+        claim = self._takeover(
+            keys=[self._key(fingerprint)], args=[stale_job_id, job_id, self._ttl_seconds, max(0, min_age_seconds)]
+        )
+        return _owner(claim)
+
+    def release(self, fingerprint: str, job_id: str) -> bool:
+        return bool(self._release(keys=[self._key(fingerprint)], args=[job_id]))
+
+
+def _owner(claim: bytes | str) -> str:
+    return _as_text(claim).partition("|")[0]
+
+
+def _as_text(value: bytes | str) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
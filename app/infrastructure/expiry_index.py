@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+from redis import Redis
+
+# Pop up to ARGV[2] members whose expiry score is <= ARGV[1] together with their recorded sizes;
+# atomic so concurrent cleaners never share keys.
+_POP_EXPIRED_SCRIPT = """
+local keys = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, ARGV[2])
+if #keys == 0 then
+    return {}
+end
+redis.call("zrem", KEYS[1], unpack(keys))
+local sizes = redis.call("hmget", KEYS[2], unpack(keys))
+redis.call("hdel", KEYS[2], unpack(keys))
+local popped = {}
+for i, key in ipairs(keys) do
+    popped[#popped + 1] = key
+    popped[#popped + 1] = sizes[i] or "0"
+end
+return popped
+"""
+
+
+class OutputExpiryIndex:
+    """Sorted set of stored object keys scored by the unix time they expire at."""
+
+    def __init__(self, connection: Redis, key: str = "rmbg:outputs:expiry") -> None:
+        self._connection = connection
+        self._key = key
+        self._sizes_key = f"{key}:sizes"
+        self._pop_expired = connection.register_script(_POP_EXPIRED_SCRIPT)
+
+    def register(self, object_key: str, expires_at: float, size: int = 0) -> None:
+        self.register_many([(object_key, size)], expires_at)
+
+    def register_many(self, objects: list[tuple[str, int]], expires_at: float) -> None:
+        if not objects:
+            return
+        pipeline = self._connection.pipeline(transaction=False)
+        pipeline.zadd(self._key, {object_key: expires_at for object_key, _ in objects})
+        pipeline.hset(self._sizes_key, mapping={object_key: size for object_key, size in objects})
+        pipeline.execute()
+
+    def pop_expired(self, now: float, limit: int = 1000) -> list[tuple[str, int]]:
+        flat = self._pop_expired(keys=[self._key, self._sizes_key], args=[now, max(1, limit)])
+        return [(_as_text(flat[i]), int(flat[i + 1])) for i in range(0, len(flat), 2)]
+
+    def expires_at(self, object_keys: list[str]) -> list[float | None]:
+        """Recorded expiry per key, ``None`` for keys the index does not hold."""
+        if not object_keys:
+            return []
+        scores = self._connection.zmscore(self._key, object_keys)
+        return [None if score is None else float(score) for score in scores]
+
+    def forget(self, object_keys: list[str]) -> None:
+        if not object_keys:
+            return
+        pipeline = self._connection.pipeline(transaction=False)
+        for start in range(0, len(object_keys), 1000):
+            chunk = object_keys[start : start + 1000]
+            pipeline.zrem(self._key, *chunk)
+            pipeline.hdel(self._sizes_key, *chunk)
+        pipeline.execute()
+
+    def size(self) -> int:
+        return int(self._connection.zcard(self._key))
+
+
+def _as_text(value: bytes | str) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
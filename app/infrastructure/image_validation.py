@@ -4,12 +4,29 @@ import io
 
 from PIL import Image, UnidentifiedImageError
 
+from app.domain.animation import frame_count
+
 
 class ImageValidationError(ValueError):
     pass
 
 
-def validate_image_bytes(image_bytes: bytes, max_pixels: int) -> tuple[int, int, str]:
+def allow_decoding_up_to(max_pixels: int) -> None:
+    """Raise Pillow's decompression-bomb threshold to the configured limit.
+
+    Pillow warns above ~89 MP and refuses ~179 MP; our own ``max_pixels`` check is the real guard.
+    """
+    Image.MAX_IMAGE_PIXELS = max(Image.MAX_IMAGE_PIXELS or 0, max_pixels)
+
+
+def count_frames(image_bytes: bytes) -> int:
+    """Frames that will be processed: every frame of an animation, otherwise just the first."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return frame_count(image)
+
+
+def validate_image_bytes(image_bytes: bytes, max_pixels: int, max_frames: int = 0) -> tuple[int, int, str]:
+    """Check the upload decodes and fits the limits; animations count the pixels of every frame."""
     if not image_bytes:
         raise ImageValidationError("Uploaded file is empty")
 
@@ -19,12 +36,15 @@ def validate_image_bytes(image_bytes: bytes, max_pixels: int) -> tuple[int, int,
         with Image.open(io.BytesIO(image_bytes)) as image:
             width, height = image.size
             fmt = (image.format or "").upper() or "UNKNOWN"
+            frames = frame_count(image)
     except (UnidentifiedImageError, OSError, SyntaxError, ValueError) as exc:
         raise ImageValidationError("Invalid or corrupted image file") from exc
 
     if width <= 0 or height <= 0:
         raise ImageValidationError("Invalid image dimensions")
-    if width * height > max_pixels:
+    if max_frames and frames > max_frames:
+        raise ImageValidationError(f"Animation has too many frames. Max allowed is {max_frames}")
+    if width * height * frames > max_pixels:
         raise ImageValidationError(f"Image too large in pixels. Max allowed is {max_pixels}")
 
     return width, height, fmt
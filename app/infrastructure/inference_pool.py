@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import BoundedSemaphore, Lock
+from typing import Any, Callable
+
+
+class InferencePool:
+    """Bounded in-process executor that turns work away instead of queueing it without limit."""
+
+    def __init__(self, workers: int, backlog: int) -> None:
+        self._workers = max(1, workers)
+        self._slots = BoundedSemaphore(self._workers + max(0, backlog))
+        self._lock = Lock()
+        self._executor: ThreadPoolExecutor | None = None
+
+    def try_submit(self, fn: Callable[..., Any], *args: Any) -> Future | None:
+        if not self._slots.acquire(blocking=False):
+            return None
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="rmbg-sync")
+            return self._executor
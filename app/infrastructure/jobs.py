@@ -10,5 +10,12 @@ def get_redis_connection() -> Redis:
     return Redis.from_url(settings.redis_url)
 
 
-def get_queue() -> Queue:
-    return Queue("rmbg", connection=get_redis_connection(), default_timeout=1200)
+def queue_name_for_model(model: str | None) -> str:
+    # Models with a dedicated lane are served by workers that keep that session warm.
+    if model and model in settings.model_lanes:
+        return f"rmbg-{model}"
+    return "rmbg"
+
+
+def get_queue(name: str = "rmbg", connection: Redis | None = None) -> Queue:
+    return Queue(name, connection=connection or get_redis_connection(), default_timeout=1200)
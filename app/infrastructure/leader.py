@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import uuid
+
+from redis import Redis
+
+# Renew the lease if we hold it, otherwise take it when it is free.
+_ACQUIRE_SCRIPT = """
+local current = redis.call("get", KEYS[1])
+if current == ARGV[1] then
+    redis.call("pexpire", KEYS[1], ARGV[2])
+    return 1
+end
+if not current then
+    redis.call("set", KEYS[1], ARGV[1], "PX", ARGV[2])
+    return 1
+end
+return 0
+"""
+
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class LeaderLease:
+    """A Redis lease that exactly one holder renews; it lapses when the holder stops renewing."""
+
+    def __init__(self, connection: Redis, name: str, lease_seconds: int) -> None:
+        self._key = f"rmbg:leader:{name}"
+        self._token = uuid.uuid4().hex
+        self._lease_ms = max(1, lease_seconds) * 1000
+        self._acquire = connection.register_script(_ACQUIRE_SCRIPT)
+        self._release = connection.register_script(_RELEASE_SCRIPT)
+
+    def acquire_or_renew(self) -> bool:
+        return bool(self._acquire(keys=[self._key], args=[self._token, self._lease_ms]))
+
+    def release(self) -> None:
+        self._release(keys=[self._key], args=[self._token])
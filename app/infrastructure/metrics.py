@@ -1,41 +1,275 @@
 from __future__ import annotations
 
+import logging
+import os
+import re
+from bisect import bisect_left
 from collections import defaultdict
-from threading import Lock
-from time import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from threading import Lock, Thread
+from time import monotonic, perf_counter, sleep, time
+
+from redis import Redis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger("rmbg.metrics")
+
+# Upper bounds in seconds shared by every latency histogram; +Inf is implicit.
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Histogram key: (metric name, rendered label set such as 'stage="inference"').
+HistogramKey = tuple[str, str]
 
 
 class MetricsStore:
+    """Process-local counters, gauges and histograms, optionally aggregated across processes in Redis.
+
+    Recording only touches in-memory dicts; once attached, counter and histogram deltas are pushed
+    to Redis at most every ``flush_interval`` seconds, so every API and worker process scrapes the
+    same totals.
+    """
+
     def __init__(self) -> None:
         self._lock = Lock()
         self._counters: dict[str, int] = defaultdict(int)
         self._gauges: dict[str, float] = defaultdict(float)
+        # Per-bucket (non-cumulative) counts, then the +Inf bucket, then the running sum.
+        self._histograms: dict[HistogramKey, list[float]] = {}
+        self._labeled_gauges: dict[HistogramKey, float] = {}
         self._last_update_ts: int = int(time())
 
+        self._shared: Redis | None = None
+        self._prefix = "rmbg:metrics"
+        self._flush_interval = 5.0
+        self._next_flush = 0.0
+        self._background = False
+        self._pending_counters: dict[str, int] = defaultdict(int)
+        self._pending_histograms: dict[HistogramKey, list[float]] = {}
+
+    def attach(
+        self,
+        connection: Redis,
+        flush_interval: float = 5.0,
+        prefix: str = "rmbg:metrics",
+        background: bool = False,
+    ) -> None:
+        """Aggregate through Redis; with ``background`` a daemon thread flushes instead of the recording call."""
+        self._shared = connection
+        self._prefix = prefix
+        self._flush_interval = flush_interval
+        self._next_flush = monotonic() + flush_interval
+        if background and not self._background:
+            self._background = True
+            Thread(target=self._flush_forever, name="rmbg-metrics-flush", daemon=True).start()
+
     def incr(self, key: str, value: int = 1) -> None:
         with self._lock:
             self._counters[key] += value
+            self._pending_counters[key] += value
             self._last_update_ts = int(time())
+        self._maybe_flush()
 
-    def set_gauge(self, key: str, value: float) -> None:
+    def set_gauge(self, key: str, value: float, labels: dict[str, str] | None = None) -> None:
         with self._lock:
-            self._gauges[key] = value
+            if labels:
+                # Labelled gauges only appear in the Prometheus output, e.g. one series per queue lane.
+                self._labeled_gauges[(key, _label_text(labels))] = value
+            else:
+                self._gauges[key] = value
             self._last_update_ts = int(time())
 
-    def snapshot(self) -> dict[str, int | float]:
+    def observe_histogram(self, name: str, value: float, labels: dict[str, str] | None = None) -> None:
+        key = (name, _label_text(labels or {}))
+        bucket = bisect_left(LATENCY_BUCKETS, value)
         with self._lock:
-            merged: dict[str, int | float] = dict(self._counters)
-            merged.update(self._gauges)
-            merged["metrics_last_update_ts"] = self._last_update_ts
-            return merged
+            for histograms in (self._histograms, self._pending_histograms):
+                counts = histograms.get(key)
+                if counts is None:
+                    counts = histograms[key] = [0.0] * (len(LATENCY_BUCKETS) + 2)
+                counts[bucket] += 1
+                counts[-1] += value
+            self._last_update_ts = int(time())
+        self._maybe_flush()
+
+    @contextmanager
+    def stage_timer(self, stage: str) -> Iterator[None]:
+        """Time a job stage into the ``stage_seconds`` histogram."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_histogram("stage_seconds", perf_counter() - started, {"stage": stage})
+
+    def flush(self) -> None:
+        if self._shared is None:
+            return
+        with self._lock:
+            counters, self._pending_counters = self._pending_counters, defaultdict(int)
+            histograms, self._pending_histograms = self._pending_histograms, {}
+            self._next_flush = monotonic() + self._flush_interval
+        if not counters and not histograms:
+            return
+
+        try:
+            pipeline = self._shared.pipeline(transaction=False)
+            for key, value in counters.items():
+                pipeline.hincrby(f"{self._prefix}:counters", key, value)
+            for key, counts in histograms.items():
+                hash_key = self._histogram_hash(key)
+                pipeline.sadd(f"{self._prefix}:histograms", hash_key)
+                for index, count in enumerate(counts[:-1]):
+                    if count:
+                        pipeline.hincrby(hash_key, str(index), int(count))
+                pipeline.hincrbyfloat(hash_key, "sum", counts[-1])
+            pipeline.execute()
+        except RedisError as exc:
+            logger.debug("metrics flush failed, keeping deltas for the next one: %s", exc)
+            self._restore_pending(counters, histograms)
+
+    def snapshot(self) -> dict[str, int | float]:
+        """Counters and gauges plus a count, p50 and p99 per histogram, estimated from its buckets."""
+        snapshot, histograms = self._collect()
+        for (name, labels), counts in sorted(histograms.items()):
+            key = _summary_name(name, labels)
+            snapshot[f"{key}_count"] = int(sum(counts[:-1]))
+            snapshot[f"{key}_p50"] = round(_quantile(counts, 0.50), 4)
+            snapshot[f"{key}_p99"] = round(_quantile(counts, 0.99), 4)
+        return snapshot
 
     def to_prometheus_text(self) -> str:
-        snapshot = self.snapshot()
+        scalars, histograms = self._collect()
+        with self._lock:
+            labeled_gauges = dict(self._labeled_gauges)
+
         lines = []
-        for key, value in sorted(snapshot.items()):
+        for key, value in sorted(scalars.items()):
             metric = key.lower().replace("-", "_")
             lines.append(f"rmbg_{metric} {value}")
+
+        typed: set[str] = set()
+        for (name, labels), value in sorted(labeled_gauges.items()):
+            metric = f"rmbg_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{{{labels}}} {value}")
+
+        for (name, labels), counts in sorted(histograms.items()):
+            metric = f"rmbg_{name}"
+            if metric not in typed:
+                typed.add(metric)
+                lines.append(f"# TYPE {metric} histogram")
+            prefix = f"{labels}," if labels else ""
+            cumulative = 0.0
+            for bound, count in zip((*LATENCY_BUCKETS, "+Inf"), counts[:-1]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{{prefix}le="{bound}"}} {int(cumulative)}')
+            lines.append(f"{metric}_sum{{{labels}}} {round(counts[-1], 6)}")
+            lines.append(f"{metric}_count{{{labels}}} {int(cumulative)}")
         return "\n".join(lines) + "\n"
 
+    def _maybe_flush(self) -> None:
+        if self._shared is not None and not self._background and monotonic() >= self._next_flush:
+            self.flush()
+
+    def _flush_forever(self) -> None:
+        while True:
+            sleep(self._flush_interval)
+            self.flush()
+
+    def _after_fork(self) -> None:
+        # A forked child must not push deltas its parent will push too, nor inherit a held lock.
+        self._lock = Lock()
+        self._pending_counters = defaultdict(int)
+        self._pending_histograms = {}
+        self._background = False
+
+    def _histogram_snapshot(self) -> dict[HistogramKey, list[float]]:
+        with self._lock:
+            return {key: list(counts) for key, counts in self._histograms.items()}
+
+    def _collect(self) -> tuple[dict[str, int | float], dict[HistogramKey, list[float]]]:
+        """Counters, gauges and histograms; counters and histograms are fleet totals when Redis is attached."""
+        with self._lock:
+            scalars: dict[str, int | float] = dict(self._counters)
+            scalars.update(self._gauges)
+            scalars["metrics_last_update_ts"] = self._last_update_ts
+        histograms = self._histogram_snapshot()
+        self._apply_shared(scalars, histograms)
+        return scalars, histograms
+
+    def _apply_shared(self, snapshot: dict[str, int | float], histograms: dict[HistogramKey, list[float]]) -> None:
+        """Replace local counters and histograms with the cross-process totals when Redis is reachable."""
+        if self._shared is None:
+            return
+        self.flush()
+        try:
+            counters = self._shared.hgetall(f"{self._prefix}:counters")
+            hash_keys = sorted(self._shared.smembers(f"{self._prefix}:histograms"))
+            pipeline = self._shared.pipeline(transaction=False)
+            for hash_key in hash_keys:
+                pipeline.hgetall(hash_key)
+            shared_histograms = pipeline.execute()
+        except RedisError as exc:
+            logger.debug("shared metrics unavailable, reporting this process only: %s", exc)
+            return
+
+        for key, value in counters.items():
+            snapshot[_as_text(key)] = int(value)
+        for hash_key, fields in zip(hash_keys, shared_histograms):
+            counts = [0.0] * (len(LATENCY_BUCKETS) + 2)
+            for field, value in fields.items():
+                field = _as_text(field)
+                counts[-1 if field == "sum" else int(field)] = float(value)
+            histograms[self._histogram_key(_as_text(hash_key))] = counts
+
+    def _restore_pending(self, counters: dict[str, int], histograms: dict[HistogramKey, list[float]]) -> None:
+        with self._lock:
+            for key, value in counters.items():
+                self._pending_counters[key] += value
+            for key, counts in histograms.items():
+                pending = self._pending_histograms.setdefault(key, [0.0] * len(counts))
+                for index, count in enumerate(counts):
+                    pending[index] += count
+
+    def _histogram_hash(self, key: HistogramKey) -> str:
+        return f"{self._prefix}:histogram:{key[0]}|{key[1]}"
+
+    def _histogram_key(self, hash_key: str) -> HistogramKey:
+        name, _, labels = hash_key[len(f"{self._prefix}:histogram:") :].partition("|")
+        return name, labels
+
+
+def _label_text(labels: dict[str, str]) -> str:
+    return ",".join(f'{label}="{labels[label]}"' for label in sorted(labels))
+
+
+def _summary_name(name: str, labels: str) -> str:
+    # stage_seconds with stage="inference" becomes stage_seconds_inference in the JSON snapshot.
+    return "_".join([name, *re.findall(r'="([^"]*)"', labels)])
+
+
+def _quantile(counts: list[float], fraction: float) -> float:
+    """Linear interpolation inside the bucket holding the rank, as Prometheus' histogram_quantile() does."""
+    total = sum(counts[:-1])
+    if not total:
+        return 0.0
+    rank = fraction * total
+    cumulative = 0.0
+    lower = 0.0
+    for bound, count in zip(LATENCY_BUCKETS, counts):
+        if count and cumulative + count >= rank:
+            return lower + (bound - lower) * (rank - cumulative) / count
+        cumulative += count
+        lower = bound
+    # The rank falls in the +Inf bucket; the largest finite bound is the best estimate.
+    return LATENCY_BUCKETS[-1]
+
+
+def _as_text(value: bytes | str) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
 
 metrics = MetricsStore()
+os.register_at_fork(after_in_child=metrics._after_fork)
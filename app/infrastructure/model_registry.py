@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable
+
+from app.infrastructure.process_stats import process_rss_mb
+
+
+class ModelSessionRegistry:
+    """Creates inference sessions on first use and keeps the most recent ones within a memory budget."""
+
+    def __init__(self, factory: Callable[[str], Any], budget_mb: int) -> None:
+        self._factory = factory
+        self._budget_mb = budget_mb
+        self._lock = Lock()
+        self._sessions: OrderedDict[str, tuple[Any, float]] = OrderedDict()
+
+    def get(self, model_name: str) -> Any:
+        with self._lock:
+            cached = self._sessions.get(model_name)
+            if cached is not None:
+                self._sessions.move_to_end(model_name)
+                return cached[0]
+
+            # Loads are serialized on purpose: two threads racing on one model would double its RSS.
+            rss_before = process_rss_mb()
+            session = self._factory(model_name)
+            cost_mb = max(1.0, process_rss_mb() - rss_before)
+            self._sessions[model_name] = (session, cost_mb)
+            self._evict()
+            return session
+
+    def loaded_models(self) -> list[str]:
+        with self._lock:
+            return list(self._sessions)
+
+    def resident_mb(self) -> float:
+        with self._lock:
+            return sum(cost for _, cost in self._sessions.values())
+
+    def _evict(self) -> None:
+        if self._budget_mb <= 0:
+            return
+        # The newest session always stays, even when it alone exceeds the budget.
+        while len(self._sessions) > 1 and sum(cost for _, cost in self._sessions.values()) > self._budget_mb:
+            self._sessions.popitem(last=False)
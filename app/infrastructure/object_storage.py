@@ -1,22 +1,81 @@
 from __future__ import annotations
 
+import asyncio
+import io
+import logging
+from collections.abc import Iterator
 from datetime import datetime
+from threading import Lock
+from typing import BinaryIO
 from urllib.parse import urlparse, urlunparse
 
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from botocore.exceptions import ClientError
 import boto3
 
 from app.config import settings
 
+logger = logging.getLogger("rmbg.storage")
+
+_MB = 1024 * 1024
+_MISSING_OBJECT_CODES = frozenset({"404", "NoSuchKey"})
+
+_shared_storage: S3ObjectStorage | None = None
+_shared_storage_lock = Lock()
+
+
+def is_missing_object(exc: BaseException) -> bool:
+    """Whether ``exc`` is S3 reporting that the requested key does not exist."""
+    return isinstance(exc, ClientError) and str(exc.response.get("Error", {}).get("Code", "")) in _MISSING_OBJECT_CODES
+
+
+def build_client_config() -> Config:
+    return Config(
+        signature_version="s3v4",
+        s3={"addressing_style": settings.s3_addressing_style},
+        max_pool_connections=settings.s3_max_pool_connections,
+        retries={"total_max_attempts": settings.s3_max_attempts, "mode": settings.s3_retry_mode},
+        tcp_keepalive=settings.s3_tcp_keepalive,
+        connect_timeout=settings.s3_connect_timeout_seconds,
+        read_timeout=settings.s3_read_timeout_seconds,
+    )
+
+
+def build_transfer_config() -> TransferConfig:
+    return TransferConfig(
+        multipart_threshold=settings.s3_multipart_threshold_mb * _MB,
+        multipart_chunksize=settings.s3_multipart_chunksize_mb * _MB,
+        max_concurrency=settings.s3_transfer_concurrency,
+        use_threads=True,
+    )
+
+
+def get_storage(ensure_bucket: bool = True) -> S3ObjectStorage:
+    """Process-wide storage; boto3 clients are thread-safe, so one connection pool serves every caller.
+
+    With ``ensure_bucket=False`` no request is made here; callers check the bucket when it suits them.
+    """
+    global _shared_storage
+    with _shared_storage_lock:
+        if _shared_storage is None:
+            _shared_storage = S3ObjectStorage()
+            if ensure_bucket:
+                try:
+                    _shared_storage.ensure_bucket()
+                except Exception as exc:  # noqa: BLE001
+                    logger.warning("storage init failed at startup: %s", exc)
+        return _shared_storage
+
 
 class S3ObjectStorage:
-    def __init__(self) -> None:
+    def __init__(self, client_config: Config | None = None, transfer_config: TransferConfig | None = None) -> None:
         if not settings.s3_access_key or not settings.s3_secret_key:
             raise RuntimeError("S3_ACCESS_KEY and S3_SECRET_KEY are required")
 
         self._bucket = settings.s3_bucket
         self._public_endpoint_url = settings.s3_public_endpoint_url
+        self._transfer_config = transfer_config or build_transfer_config()
         self._client = boto3.client(
             "s3",
             endpoint_url=settings.s3_endpoint_url,
@@ -24,7 +83,7 @@ class S3ObjectStorage:
             aws_access_key_id=settings.s3_access_key,
             aws_secret_access_key=settings.s3_secret_key,
             use_ssl=settings.s3_secure,
-            config=Config(signature_version="s3v4", s3={"addressing_style": settings.s3_addressing_style}),
+            config=client_config or build_client_config(),
         )
 
     @property
@@ -42,7 +101,21 @@ class S3ObjectStorage:
             raise
 
     def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
-        self._client.put_object(Bucket=self._bucket, Key=key, Body=data, ContentType=content_type)
+        # Below the multipart threshold a single PUT beats spinning up the transfer manager's threads.
+        if len(data) < self._transfer_config.multipart_threshold:
+            self._client.put_object(Bucket=self._bucket, Key=key, Body=data, ContentType=content_type)
+            return
+        self.upload_fileobj(key, io.BytesIO(data), content_type)
+
+    def upload_fileobj(self, key: str, fileobj: BinaryIO, content_type: str) -> None:
+        """Upload in concurrent multipart chunks as configured by the transfer config."""
+        self._client.upload_fileobj(
+            fileobj,
+            self._bucket,
+            key,
+            ExtraArgs={"ContentType": content_type},
+            Config=self._transfer_config,
+        )
 
     def get_bytes(self, key: str) -> bytes:
         response = self._client.get_object(Bucket=self._bucket, Key=key)
@@ -50,16 +123,31 @@ class S3ObjectStorage:
         response["Body"].close()
         return body
 
+    def download_fileobj(self, key: str, fileobj: BinaryIO) -> None:
+        """Download with concurrent ranged GETs; worth it for objects above the multipart threshold."""
+        self._client.download_fileobj(self._bucket, key, fileobj, Config=self._transfer_config)
+
     def delete_object(self, key: str) -> None:
         self._client.delete_object(Bucket=self._bucket, Key=key)
 
-    def iter_job_objects(self, prefix: str = "jobs/") -> list[dict[str, datetime | str]]:
+    def delete_objects(self, keys: list[str]) -> list[str]:
+        """Delete keys in batches of 1000 (the S3 limit) and return the keys that failed."""
+        failed: list[str] = []
+        for start in range(0, len(keys), 1000):
+            chunk = keys[start : start + 1000]
+            response = self._client.delete_objects(
+                Bucket=self._bucket,
+                Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True},
+            )
+            failed.extend(str(error["Key"]) for error in response.get("Errors", []))
+        return failed
+
+    def iter_job_objects(self, prefix: str = "jobs/") -> Iterator[dict[str, datetime | str | int]]:
+        # Yields page by page so a scan holds at most one listing page (1000 keys) in memory.
         paginator = self._client.get_paginator("list_objects_v2")
-        items: list[dict[str, datetime | str]] = []
         for page in paginator.paginate(Bucket=self._bucket, Prefix=prefix):
             for obj in page.get("Contents", []):
-                items.append({"key": obj["Key"], "last_modified": obj["LastModified"]})
-        return items
+                yield {"key": obj["Key"], "last_modified": obj["LastModified"], "size": int(obj.get("Size", 0))}
 
     def presigned_get_url(self, key: str, ttl_seconds: int) -> str:
         url = self._client.generate_presigned_url(
@@ -85,3 +173,19 @@ class S3ObjectStorage:
                 signed.fragment,
             )
         )
+
+
+class AsyncObjectStorage:
+    """Awaitable facade for async handlers; each call runs the blocking boto3 request in a worker thread."""
+
+    def __init__(self, storage: S3ObjectStorage) -> None:
+        self._storage = storage
+
+    async def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
+        await asyncio.to_thread(self._storage.put_bytes, key, data, content_type)
+
+    async def get_bytes(self, key: str) -> bytes:
+        return await asyncio.to_thread(self._storage.get_bytes, key)
+
+    async def presigned_get_url(self, key: str, ttl_seconds: int) -> str:
+        return await asyncio.to_thread(self._storage.presigned_get_url, key, ttl_seconds)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+
+
+class JobProfiler:
+    """Sampling profiler for one job: folded call stacks of the calling thread plus the tracemalloc peak.
+
+    A daemon thread reads the job thread's frame from ``sys._current_frames()`` every ``interval``
+    seconds, so the job itself runs uninstrumented apart from tracemalloc's allocation hooks.
+    Native time (onnxruntime, Pillow) shows up under the Python frame that called into it.
+    """
+
+    def __init__(self, interval: float = 0.005, top: int = 25) -> None:
+        self._interval = max(0.001, interval)
+        self._top = top
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._sampler: threading.Thread | None = None
+        self._target = 0
+        self._owns_tracemalloc = False
+        self._started = 0.0
+        self._wall_seconds = 0.0
+        self._peak_bytes = 0
+
+    def start(self) -> None:
+        self._target = threading.get_ident()
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        else:
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._started = time.perf_counter()
+        self._sampler = threading.Thread(target=self._sample, name="rmbg-job-profiler", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._wall_seconds = time.perf_counter() - self._started
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        _, self._peak_bytes = tracemalloc.get_traced_memory()
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+
+    def to_dict(self) -> dict:
+        leaves: Counter[str] = Counter()
+        for stack, count in self._stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        samples = sum(self._stacks.values())
+        return {
+            "pid": os.getpid(),
+            "wall_seconds": round(self._wall_seconds, 4),
+            "interval_ms": round(self._interval * 1000, 2),
+            "samples": samples,
+            # Python heap only; numpy buffers are traced, Pillow's image memory is not.
+            "tracemalloc_peak_mb": round(self._peak_bytes / (1024 * 1024), 2),
+            "top_self": [
+                {"frame": frame, "samples": count, "share": round(count / samples, 4)}
+                for frame, count in leaves.most_common(self._top)
+            ],
+            # Collapsed "outer;...;inner" stacks, the input format of flamegraph.pl and speedscope.
+            "stacks": dict(self._stacks.most_common()),
+        }
+
+    def to_json(self) -> bytes:
+        return json.dumps(self.to_dict()).encode("utf-8")
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self._interval):
+            frame = sys._current_frames().get(self._target)
+            if frame is not None:
+                self._stacks[_fold(frame)] += 1
+
+
+def _fold(frame: FrameType | None) -> str:
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import json
+import time
+from dataclasses import asdict, dataclass
+
+from redis import Redis
+from rq import Queue
+from rq.registry import FailedJobRegistry, StartedJobRegistry
+
+_CACHE_KEY = "rmbg:queue-stats"
+
+
+@dataclass
+class LaneStats:
+    queued: int = 0
+    started: int = 0
+    failed: int = 0
+
+
+def read_queue_stats(connection: Redis, lanes: list[str], cache_seconds: float = 0.0) -> dict[str, LaneStats]:
+    """Queued, started and failed counts per lane in one pipelined round trip.
+
+    Registry sizes come from ZCOUNT over unexpired scores, so the cost does not grow with the
+    backlog and entries awaiting rq's cleanup are not counted. With ``cache_seconds`` the result is
+    shared through Redis, so scrapes from every API process inside that window read one key.
+    """
+    if cache_seconds > 0:
+        cached = connection.get(_CACHE_KEY)
+        if cached:
+            stats = {lane: LaneStats(**counts) for lane, counts in json.loads(cached).items()}
+            if set(stats) == set(lanes):
+                return stats
+
+    now = time.time()
+    pipeline = connection.pipeline(transaction=False)
+    for lane in lanes:
+        pipeline.llen(Queue(lane, connection=connection).key)
+        pipeline.zcount(StartedJobRegistry(name=lane, connection=connection).key, now, "+inf")
+        pipeline.zcount(FailedJobRegistry(name=lane, connection=connection).key, now, "+inf")
+    counts = pipeline.execute()
+    stats = {
+        lane: LaneStats(*(int(value) for value in counts[index * 3 : index * 3 + 3]))
+        for index, lane in enumerate(lanes)
+    }
+
+    if cache_seconds > 0:
+        payload = json.dumps({lane: asdict(lane_stats) for lane, lane_stats in stats.items()})
+        connection.set(_CACHE_KEY, payload, px=max(1, int(cache_seconds * 1000)))
+    return stats
@@ -1,14 +1,116 @@
 from __future__ import annotations
 
-from rembg import new_session, remove
+import logging
+import os
+from pathlib import Path
 
+import onnxruntime as ort
+from PIL import Image
+from rembg import remove
+from rembg.sessions import sessions_class
+
+from app.config import settings
 from app.domain.background_remover import BackgroundRemover
+from app.infrastructure.model_registry import ModelSessionRegistry
+
+logger = logging.getLogger("rmbg.models")
+
+MODEL_VARIANTS = ("fp32", "int8", "optimized")
+
+_EXECUTION_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+
+
+def build_session_options(intra_op_threads: int = 0) -> ort.SessionOptions:
+    sess_opts = ort.SessionOptions()
+
+    # The caller's count wins, then the setting, then the per-worker share the supervisor exported.
+    intra_op_threads = (
+        intra_op_threads or settings.onnx_intra_op_threads or int(os.getenv("OMP_NUM_THREADS", "0") or 0)
+    )
+    if intra_op_threads > 0:
+        sess_opts.intra_op_num_threads = intra_op_threads
+    if settings.onnx_inter_op_threads > 0:
+        sess_opts.inter_op_num_threads = settings.onnx_inter_op_threads
+
+    if settings.onnx_execution_mode not in _EXECUTION_MODES:
+        raise ValueError(f"Unknown ONNX_EXECUTION_MODE '{settings.onnx_execution_mode}'")
+    if settings.onnx_graph_optimization not in _GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"Unknown ONNX_GRAPH_OPTIMIZATION '{settings.onnx_graph_optimization}'")
+    sess_opts.execution_mode = _EXECUTION_MODES[settings.onnx_execution_mode]
+    sess_opts.graph_optimization_level = _GRAPH_OPTIMIZATION_LEVELS[settings.onnx_graph_optimization]
+    sess_opts.enable_cpu_mem_arena = settings.onnx_enable_cpu_mem_arena
+    sess_opts.enable_mem_pattern = settings.onnx_enable_mem_pattern
+    return sess_opts
+
+
+def variant_model_path(session_class, model_name: str, variant: str) -> Path:
+    variant_dir = settings.rembg_variant_dir or os.path.join(session_class.u2net_home(), "variants")
+    return Path(variant_dir) / f"{model_name}.{variant}.onnx"
+
+
+def _with_model_path(session_class, model_path: Path):
+    # BaseSession loads whatever download_models() returns, so point it at the variant file.
+    return type(
+        f"{session_class.__name__}Variant",
+        (session_class,),
+        {"download_models": classmethod(lambda cls, *args, **kwargs: str(model_path))},
+    )
+
+
+def create_session(model_name: str = "u2net", variant: str | None = None, intra_op_threads: int = 0):
+    variant = (variant or settings.rembg_model_variant).lower()
+    if variant not in MODEL_VARIANTS:
+        raise ValueError(f"Unknown REMBG_MODEL_VARIANT '{variant}'")
+
+    # rembg's new_session() builds its own SessionOptions, so resolve the session class here instead.
+    for session_class in sessions_class:
+        if session_class.name() != model_name:
+            continue
+        sess_opts = build_session_options(intra_op_threads)
+        if variant == "fp32":
+            return session_class(model_name, sess_opts)
+
+        model_path = variant_model_path(session_class, model_name, variant)
+        if not model_path.is_file():
+            logger.warning("%s variant of %s not found at %s, loading fp32", variant, model_name, model_path)
+            return session_class(model_name, sess_opts)
+        if variant == "optimized":
+            # The graph was optimized offline; repeating it would only slow the load down.
+            sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_DISABLE_ALL
+        return _with_model_path(session_class, model_path)(model_name, sess_opts)
+    raise ValueError(f"No rembg session found for model '{model_name}'")
 
 
 class RembgBackgroundRemover(BackgroundRemover):
-    def __init__(self) -> None:
-        # Keep one session alive to avoid reloading model every request.
-        self._session = new_session()
+    def __init__(self, default_model: str | None = None, intra_op_threads: int = 0) -> None:
+        # Sessions stay alive across requests; only cold models pay the load cost.
+        self._default_model = default_model or settings.rembg_default_model
+        self._sessions = ModelSessionRegistry(
+            lambda model_name: create_session(model_name, intra_op_threads=intra_op_threads),
+            settings.model_cache_max_mb,
+        )
+
+    @property
+    def loaded_models(self) -> list[str]:
+        return self._sessions.loaded_models()
+
+    def warm(self, model_name: str | None = None) -> None:
+        self._sessions.get(model_name or self._default_model)
+
+    def remove(self, image_bytes: bytes, model_name: str | None = None) -> bytes:
+        session = self._sessions.get(model_name or self._default_model)
+        return remove(image_bytes, session=session)
 
-    def remove(self, image_bytes: bytes) -> bytes:
-        return remove(image_bytes, session=self._session)
+    def predict_mask(self, image: Image.Image, model_name: str | None = None) -> Image.Image:
+        session = self._sessions.get(model_name or self._default_model)
+        return session.predict(image)[0]
@@ -1,40 +1,129 @@
 from __future__ import annotations
 
+import asyncio
 import json
 import logging
 import time
 import uuid
 from collections import defaultdict, deque
-from dataclasses import dataclass
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
+from threading import Lock, Thread
+from typing import TYPE_CHECKING
 
 from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import FileResponse, PlainTextResponse, Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
-from rq import Retry
+from rq import Queue, Retry
+from redis.exceptions import RedisError
+from rq.exceptions import NoSuchJobError
 from rq.job import Job
-from rq.registry import FailedJobRegistry, StartedJobRegistry
+from rq.registry import FailedJobRegistry
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.application.remove_background_use_case import (
+    OUTPUT_FORMATS,
+    RemoveBackgroundOptions,
+    RemoveBackgroundResult,
+    RemoveBackgroundUseCase,
+    refine_cutout,
+)
 from app.config import settings
-from app.infrastructure.image_validation import ImageValidationError, validate_image_bytes
-from app.infrastructure.jobs import get_queue, get_redis_connection
+from app.infrastructure.dedup import InFlightRegistry, submission_fingerprint
+from app.infrastructure.image_validation import (
+    ImageValidationError,
+    allow_decoding_up_to,
+    count_frames,
+    validate_image_bytes,
+)
+from app.infrastructure.inference_pool import InferencePool
+from app.infrastructure.jobs import get_queue, get_redis_connection, queue_name_for_model
 from app.infrastructure.metrics import metrics
-from app.infrastructure.object_storage import S3ObjectStorage
+from app.infrastructure.process_stats import available_cpus
+from app.infrastructure.queue_stats import LaneStats, read_queue_stats
+
+if TYPE_CHECKING:
+    from app.infrastructure.object_storage import AsyncObjectStorage, S3ObjectStorage
 
 logger = logging.getLogger("rmbg.api")
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO)
 
-app = FastAPI(title="Background Remover")
+allow_decoding_up_to(settings.max_image_pixels)
 
+# Nothing below touches the network: redis-py connects on first command, and the S3 client is built
+# on first use or by the warm-up thread the lifespan starts.
 queue = get_queue()
 redis_connection = get_redis_connection()
-storage = S3ObjectStorage()
-try:
-    storage.ensure_bucket()
-except Exception as exc:  # noqa: BLE001
-    logger.warning("storage init failed at startup: %s", exc)
+lane_queues: dict[str, Queue] = {}
+inflight = InFlightRegistry(redis_connection, ttl_seconds=settings.dedup_ttl_seconds)
+inference_pool = InferencePool(settings.sync_pool_workers, settings.sync_pool_backlog)
+sync_use_case: RemoveBackgroundUseCase | None = None
+_sync_use_case_lock = Lock()
+storage: S3ObjectStorage | None = None
+_storage_lock = Lock()
+readiness: dict[str, bool] = {"redis": False, "storage": False}
+
+_WARM_UP_MAX_BACKOFF_SECONDS = 10.0
+
+
+def _get_storage() -> S3ObjectStorage:
+    global storage
+    with _storage_lock:
+        if storage is None:
+            # Deferred: boto3 and botocore add noticeably to import time, and the bucket check runs in warm-up.
+            from app.infrastructure.object_storage import get_storage
+
+            storage = get_storage(ensure_bucket=False)
+        return storage
+
+
+def _async_storage() -> AsyncObjectStorage:
+    from app.infrastructure.object_storage import AsyncObjectStorage
+
+    return AsyncObjectStorage(_get_storage())
+
+
+def _warm_up() -> None:
+    """Load the sync model, then connect to Redis and S3 until both answer; /api/ready reports the outcome."""
+    if settings.sync_inference_enabled:
+        try:
+            _get_sync_use_case()
+        except Exception as exc:  # noqa: BLE001
+            # The first sync request retries the load; the queue path does not need this model.
+            logger.warning("could not preload the sync model: %s", exc)
+    backoff = 0.5
+    while not all(readiness.values()):
+        if not readiness["redis"]:
+            try:
+                readiness["redis"] = bool(redis_connection.ping())
+            except RedisError as exc:
+                logger.warning("redis not reachable yet: %s", exc)
+        if not readiness["storage"]:
+            try:
+                _get_storage().ensure_bucket()
+                readiness["storage"] = True
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("storage not reachable yet: %s", exc)
+        if not all(readiness.values()):
+            time.sleep(backoff)
+            backoff = min(_WARM_UP_MAX_BACKOFF_SECONDS, backoff * 2)
+    logger.info("api warm-up complete")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    if settings.metrics_shared_enabled:
+        # A background thread pushes this process's deltas so the event loop never waits on Redis.
+        metrics.attach(redis_connection, settings.metrics_flush_interval_seconds, background=True)
+    # Requests are served while this runs; ones that need S3 before it finishes build the client themselves.
+    Thread(target=_warm_up, name="rmbg-warm-up", daemon=True).start()
+    yield
+
+
+app = FastAPI(title="Background Remover", lifespan=lifespan)
 
 
 @dataclass
@@ -103,12 +192,52 @@ def _validate_options(feather_radius: float, alpha_boost: float) -> tuple[float,
     return feather_radius, alpha_boost
 
 
+def _validate_model(model: str) -> str:
+    resolved = model.strip() or settings.rembg_default_model
+    if resolved not in settings.rembg_models:
+        raise HTTPException(status_code=400, detail=f"model must be one of: {', '.join(settings.rembg_models)}")
+    return resolved
+
+
+def _validate_output_options(
+    output_format: str,
+    png_compress_level: int,
+    webp_quality: int,
+    crop_to_content: bool = False,
+    crop_padding: int = 0,
+) -> dict[str, str | int | bool]:
+    if output_format not in OUTPUT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"output_format must be one of: {', '.join(OUTPUT_FORMATS)}")
+    if png_compress_level < 0 or png_compress_level > 9:
+        raise HTTPException(status_code=400, detail="png_compress_level must be between 0 and 9")
+    if webp_quality < 1 or webp_quality > 100:
+        raise HTTPException(status_code=400, detail="webp_quality must be between 1 and 100")
+    if crop_padding < 0 or crop_padding > 1024:
+        raise HTTPException(status_code=400, detail="crop_padding must be between 0 and 1024")
+    options: dict[str, str | int | bool] = {
+        "output_format": output_format,
+        "png_compress_level": png_compress_level,
+        "webp_quality": webp_quality,
+    }
+    if crop_to_content:
+        options.update(crop_to_content=True, crop_padding=crop_padding)
+    return options
+
+
+def _lane_queue(name: str | None) -> Queue:
+    if not name or name == queue_name_for_model(None):
+        return queue
+    if name not in lane_queues:
+        lane_queues[name] = get_queue(name, connection=redis_connection)
+    return lane_queues[name]
+
+
 def _ensure_image_content_type(file: UploadFile) -> None:
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail=f"{file.filename or 'file'} is not an image")
 
 
-def _read_and_validate_image(file: UploadFile, image_bytes: bytes) -> None:
+def _read_and_validate_image(file: UploadFile, image_bytes: bytes) -> tuple[int, int]:
     _ensure_image_content_type(file)
     if len(image_bytes) > settings.max_image_bytes:
         raise HTTPException(
@@ -116,9 +245,57 @@ def _read_and_validate_image(file: UploadFile, image_bytes: bytes) -> None:
             detail=f"{file.filename or 'file'} is too large. Max size is {settings.max_image_bytes // (1024 * 1024)} MB",
         )
     try:
-        validate_image_bytes(image_bytes, max_pixels=settings.max_image_pixels)
+        with metrics.stage_timer("validate"):
+            width, height, _ = validate_image_bytes(
+                image_bytes, max_pixels=settings.max_image_pixels, max_frames=settings.max_animation_frames
+            )
     except ImageValidationError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return width, height
+
+
+def _sync_onnx_threads() -> int:
+    if settings.sync_onnx_threads > 0:
+        return settings.sync_onnx_threads
+    # Every sync pool thread of every API process may run a session at once.
+    return max(1, available_cpus() // max(1, settings.api_processes * settings.sync_pool_workers))
+
+
+def _get_sync_use_case() -> RemoveBackgroundUseCase:
+    """The sync path's use case with its default model loaded; the warm-up thread builds it at startup."""
+    global sync_use_case
+    with _sync_use_case_lock:
+        if sync_use_case is None:
+            # Deferred: importing onnxruntime and rembg would slow down the API's import.
+            from app.infrastructure.rembg_background_remover import RembgBackgroundRemover
+
+            remover = RembgBackgroundRemover(intra_op_threads=_sync_onnx_threads())
+            remover.warm()
+            sync_use_case = RemoveBackgroundUseCase(
+                remover,
+                settings.large_image_pixels,
+                settings.tile_rows,
+                settings.animation_reuse_threshold,
+                stage_timer=metrics.stage_timer,
+            )
+        return sync_use_case
+
+
+def _run_sync_inference(image_bytes: bytes, options: RemoveBackgroundOptions) -> RemoveBackgroundResult:
+    return _get_sync_use_case().execute(image_bytes, options)
+
+
+def _run_sync_refine(source_key: str, options: RemoveBackgroundOptions) -> RemoveBackgroundResult:
+    with metrics.stage_timer("download"):
+        cutout = _get_storage().get_bytes(source_key)
+    return refine_cutout(cutout, options, metrics.stage_timer)
+
+
+def _sync_headers(result: RemoveBackgroundResult) -> dict[str, str]:
+    headers = {"x-rmbg-path": "sync"}
+    if result.crop_box is not None:
+        headers["x-rmbg-crop-box"] = ",".join(str(value) for value in result.crop_box)
+    return headers
 
 
 def _enqueue_retry() -> Retry | None:
@@ -134,7 +311,7 @@ def _status_payload(job: Job) -> dict:
     status = job.get_status(refresh=True)
     meta = job.meta or {}
 
-    payload: dict[str, str | int | None] = {
+    payload: dict[str, str | int | list[int] | None] = {
         "job_id": job.id,
         "status": status,
         "download_path": None,
@@ -143,6 +320,9 @@ def _status_payload(job: Job) -> dict:
         "stage": str(meta.get("stage", "queued")),
         "error": None,
         "eta_seconds": None,
+        "crop_box": None,
+        "preview_path": f"/api/jobs/{job.id}/preview" if meta.get("preview_key") else None,
+        "profile_path": f"/api/jobs/{job.id}/profile" if meta.get("profile_key") else None,
     }
 
     if status == "failed":
@@ -152,6 +332,7 @@ def _status_payload(job: Job) -> dict:
         result = job.result or {}
         filename = result.get("filename") if isinstance(result, dict) else None
         payload["filename"] = filename
+        payload["crop_box"] = result.get("crop_box") if isinstance(result, dict) else None
         payload["download_path"] = f"/api/jobs/{job.id}/download"
         payload["progress"] = 100
         payload["stage"] = "done"
@@ -167,11 +348,78 @@ def _status_payload(job: Job) -> dict:
     return payload
 
 
+def _fetch_job(job_id: str) -> Job:
+    try:
+        return Job.fetch(job_id, connection=redis_connection)
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=404, detail="Job not found") from exc
+
+
+def _finished_result(job_id: str) -> dict:
+    """The result dict of a finished job. Makes blocking Redis calls; async handlers run it in a thread."""
+    job = _fetch_job(job_id)
+    if job.get_status(refresh=True) != "finished":
+        raise HTTPException(status_code=409, detail="Job is not finished")
+    result = job.result or {}
+    return result if isinstance(result, dict) else {}
+
+
+def _enqueue_deduplicated(target_queue: Queue, func_name: str, fingerprint: str, *args) -> tuple[str, str, bool]:
+    """Enqueue ``func_name`` unless an identical submission is already queued or running."""
+    job_id = str(uuid.uuid4())
+    claimed = False
+    if settings.dedup_enabled:
+        metrics.incr("dedup_checks_total")
+        try:
+            owner = inflight.claim(fingerprint, job_id)
+            for _ in range(3):
+                if owner == job_id:
+                    claimed = True
+                    break
+                try:
+                    owner_status = Job.fetch(owner, connection=redis_connection).get_status(refresh=True)
+                except NoSuchJobError:
+                    owner_status = None
+                # A finished owner's result may already have expired, so it is not reused; its claim is stale.
+                if owner_status in {"queued", "started", "deferred", "scheduled"}:
+                    metrics.incr("jobs_deduplicated_total")
+                    return owner, str(owner_status), True
+                # No job yet may just mean the owner claimed but has not enqueued; only a claim older than
+                # the grace period is taken over.
+                grace = settings.dedup_claim_grace_seconds if owner_status is None else 0
+                previous, owner = owner, inflight.takeover(fingerprint, owner, job_id, grace)
+                if owner == previous:
+                    metrics.incr("jobs_deduplicated_total")
+                    return owner, "queued", True
+        except RedisError as exc:
+            logger.warning("dedup lookup failed, enqueueing without dedup: %s", exc)
+
+    retry = _enqueue_retry()
+    try:
+        job = target_queue.enqueue(
+            func_name,
+            *args,
+            job_id=job_id,
+            meta={"dedup_fingerprint": fingerprint} if claimed else None,
+            result_ttl=settings.job_result_ttl_seconds,
+            failure_ttl=settings.job_failure_ttl_seconds,
+            retry=retry,
+        )
+    except Exception:
+        if claimed:
+            inflight.release(fingerprint, job_id)
+        raise
+
+    metrics.incr("jobs_submitted_total")
+    return job.id, "queued", False
+
+
 def _enqueue_cleanup_job() -> str:
     retry = _enqueue_retry()
     job = queue.enqueue(
         "app.tasks.maintenance_jobs.cleanup_expired_outputs_job",
         settings.cleanup_older_than_seconds,
+        True,
         result_ttl=settings.job_result_ttl_seconds,
         failure_ttl=settings.job_failure_ttl_seconds,
         retry=retry,
@@ -179,13 +427,118 @@ def _enqueue_cleanup_job() -> str:
     return job.id
 
 
-def _queue_stats() -> tuple[int, int, int]:
+def _queue_lanes() -> list[str]:
+    return list(dict.fromkeys([queue.name, *(queue_name_for_model(model) for model in settings.model_lanes)]))
+
+
+def _queue_stats() -> dict[str, LaneStats]:
     try:
-        started_registry = StartedJobRegistry(name=queue.name, connection=redis_connection)
-        failed_registry = FailedJobRegistry(name=queue.name, connection=redis_connection)
-        return queue.count, len(started_registry.get_job_ids()), len(failed_registry.get_job_ids())
-    except Exception:  # noqa: BLE001
-        return 0, 0, 0
+        return read_queue_stats(redis_connection, _queue_lanes(), settings.queue_stats_cache_seconds)
+    except RedisError:
+        return {}
+
+
+def _record_queue_gauges() -> dict[str, LaneStats]:
+    lanes = _queue_stats()
+    metrics.set_gauge("queue_depth", sum(stats.queued for stats in lanes.values()))
+    metrics.set_gauge("queue_started", sum(stats.started for stats in lanes.values()))
+    metrics.set_gauge("queue_failed", sum(stats.failed for stats in lanes.values()))
+    for lane, stats in lanes.items():
+        metrics.set_gauge("queue_lane_depth", stats.queued, {"queue": lane})
+        metrics.set_gauge("queue_lane_started", stats.started, {"queue": lane})
+        metrics.set_gauge("queue_lane_failed", stats.failed, {"queue": lane})
+    return lanes
+
+
+def _enqueue_single_image(
+    image_bytes: bytes,
+    original_name: str,
+    feather_radius: float,
+    alpha_boost: float,
+    model: str,
+    output_options: dict[str, str | int | bool],
+    preview: bool = False,
+    profile: bool = False,
+) -> tuple[str, str, bool]:
+    fingerprint = submission_fingerprint(
+        "single",
+        image_bytes,
+        original_name,
+        feather_radius,
+        alpha_boost,
+        model,
+        json.dumps(output_options, sort_keys=True),
+        str(preview),
+        # A profiling request needs its own run, not someone else's in-flight job.
+        str(profile),
+    )
+    return _enqueue_deduplicated(
+        _lane_queue(queue_name_for_model(model)),
+        "app.tasks.background_jobs.process_single_image_job",
+        fingerprint,
+        image_bytes,
+        original_name,
+        feather_radius,
+        alpha_boost,
+        model,
+        output_options,
+        preview,
+        profile,
+    )
+
+
+@app.post("/api/remove-bg", response_model=None)
+async def remove_bg_sync(
+    file: UploadFile = File(...),
+    feather_radius: float = Form(0.0),
+    alpha_boost: float = Form(1.0),
+    model: str = Form(""),
+    output_format: str = Form("png"),
+    png_compress_level: int = Form(6),
+    webp_quality: int = Form(90),
+    crop_to_content: bool = Form(False),
+    crop_padding: int = Form(0),
+) -> Response:
+    feather_radius, alpha_boost = _validate_options(feather_radius, alpha_boost)
+    model = _validate_model(model)
+    output_options = _validate_output_options(
+        output_format, png_compress_level, webp_quality, crop_to_content, crop_padding
+    )
+    image_bytes = await file.read()
+    width, height = _read_and_validate_image(file, image_bytes)
+    started = time.perf_counter()
+
+    future = None
+    fallback = "disabled"
+    if settings.sync_inference_enabled:
+        fallback = "too_large"
+        # Animations cost inference per distinct frame, so they are budgeted on every frame's pixels.
+        if width * height * count_frames(image_bytes) <= settings.sync_max_pixels:
+            options = RemoveBackgroundOptions(
+                feather_radius=feather_radius, alpha_boost=alpha_boost, model=model, **output_options
+            )
+            future = inference_pool.try_submit(_run_sync_inference, image_bytes, options)
+            fallback = "saturated"
+
+    if future is not None:
+        try:
+            result = await asyncio.wrap_future(future)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        metrics.incr("sync_requests_total")
+        metrics.observe_histogram("sync_latency_seconds", time.perf_counter() - started)
+        return Response(content=result.data, media_type=result.content_type, headers=_sync_headers(result))
+
+    # Too big or too busy for the API tier: hand it to the workers and let the client poll.
+    metrics.incr(f"sync_fallback_{fallback}_total")
+    job_id, status, deduplicated = _enqueue_single_image(
+        image_bytes, file.filename or "image.png", feather_radius, alpha_boost, model, output_options
+    )
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": status, "deduplicated": deduplicated, "fallback": fallback},
+        headers={"x-rmbg-path": "queue", "Location": f"/api/jobs/{job_id}"},
+    )
 
 
 @app.post("/api/jobs/remove-bg")
@@ -193,25 +546,34 @@ async def enqueue_remove_bg(
     file: UploadFile = File(...),
     feather_radius: float = Form(0.0),
     alpha_boost: float = Form(1.0),
-) -> dict[str, str]:
+    model: str = Form(""),
+    output_format: str = Form("png"),
+    png_compress_level: int = Form(6),
+    webp_quality: int = Form(90),
+    crop_to_content: bool = Form(False),
+    crop_padding: int = Form(0),
+    preview: bool = Form(False),
+    profile: bool = Form(False),
+) -> dict[str, str | bool]:
     feather_radius, alpha_boost = _validate_options(feather_radius, alpha_boost)
+    model = _validate_model(model)
+    output_options = _validate_output_options(
+        output_format, png_compress_level, webp_quality, crop_to_content, crop_padding
+    )
     image_bytes = await file.read()
     _read_and_validate_image(file, image_bytes)
 
-    retry = _enqueue_retry()
-    job = queue.enqueue(
-        "app.tasks.background_jobs.process_single_image_job",
+    job_id, status, deduplicated = _enqueue_single_image(
         image_bytes,
         file.filename or "image.png",
         feather_radius,
         alpha_boost,
-        result_ttl=settings.job_result_ttl_seconds,
-        failure_ttl=settings.job_failure_ttl_seconds,
-        retry=retry,
+        model,
+        output_options,
+        preview,
+        profile,
     )
-
-    metrics.incr("jobs_submitted_total")
-    return {"job_id": job.id, "status": "queued"}
+    return {"job_id": job_id, "status": status, "deduplicated": deduplicated}
 
 
 @app.post("/api/jobs/remove-bg-batch")
@@ -219,13 +581,24 @@ async def enqueue_remove_bg_batch(
     files: list[UploadFile] = File(...),
     feather_radius: float = Form(0.0),
     alpha_boost: float = Form(1.0),
-) -> dict[str, str]:
+    model: str = Form(""),
+    output_format: str = Form("png"),
+    png_compress_level: int = Form(6),
+    webp_quality: int = Form(90),
+    crop_to_content: bool = Form(False),
+    crop_padding: int = Form(0),
+    profile: bool = Form(False),
+) -> dict[str, str | bool]:
     if not files:
         raise HTTPException(status_code=400, detail="No files uploaded")
     if len(files) > settings.max_batch_files:
         raise HTTPException(status_code=400, detail=f"Max {settings.max_batch_files} files per batch")
 
     feather_radius, alpha_boost = _validate_options(feather_radius, alpha_boost)
+    model = _validate_model(model)
+    output_options = _validate_output_options(
+        output_format, png_compress_level, webp_quality, crop_to_content, crop_padding
+    )
 
     payload: list[dict[str, bytes | str]] = []
     for index, file in enumerate(files, start=1):
@@ -236,19 +609,28 @@ async def enqueue_remove_bg_batch(
             raise HTTPException(status_code=exc.status_code, detail=f"file-{index}: {exc.detail}") from exc
         payload.append({"name": file.filename or f"file-{index}.png", "bytes": image_bytes})
 
-    retry = _enqueue_retry()
-    job = queue.enqueue(
+    fingerprint_parts: list[bytes | str | float] = [
+        "batch",
+        feather_radius,
+        alpha_boost,
+        model,
+        json.dumps(output_options, sort_keys=True),
+        str(profile),
+    ]
+    for item in payload:
+        fingerprint_parts.extend((item["name"], item["bytes"]))
+    job_id, status, deduplicated = _enqueue_deduplicated(
+        _lane_queue(queue_name_for_model(model)),
         "app.tasks.background_jobs.process_batch_images_job",
+        submission_fingerprint(*fingerprint_parts),
         payload,
         feather_radius,
         alpha_boost,
-        result_ttl=settings.job_result_ttl_seconds,
-        failure_ttl=settings.job_failure_ttl_seconds,
-        retry=retry,
+        model,
+        output_options,
+        profile,
     )
-
-    metrics.incr("jobs_submitted_total")
-    return {"job_id": job.id, "status": "queued"}
+    return {"job_id": job_id, "status": status, "deduplicated": deduplicated}
 
 
 @app.get("/api/jobs/{job_id}")
@@ -277,6 +659,68 @@ def cancel_job(job_id: str) -> dict[str, str]:
     return {"job_id": job.id, "status": "canceled"}
 
 
+@app.post("/api/jobs/{job_id}/refine", response_model=None)
+async def refine_job(
+    job_id: str,
+    feather_radius: float = Form(0.0),
+    alpha_boost: float = Form(1.0),
+    output_format: str = Form("png"),
+    png_compress_level: int = Form(6),
+    webp_quality: int = Form(90),
+    crop_to_content: bool = Form(False),
+    crop_padding: int = Form(0),
+    sync: bool = Form(False),
+) -> Response:
+    feather_radius, alpha_boost = _validate_options(feather_radius, alpha_boost)
+    output_options = _validate_output_options(
+        output_format, png_compress_level, webp_quality, crop_to_content, crop_padding
+    )
+    result = await asyncio.to_thread(_finished_result, job_id)
+    source_key = result.get("source_key")
+    if not source_key:
+        raise HTTPException(status_code=409, detail="Job has no cached mask to refine")
+    original_name = str(result.get("filename") or "image.png")
+
+    metrics.incr("refine_requests_total")
+    if sync:
+        started = time.perf_counter()
+        options = RemoveBackgroundOptions(feather_radius=feather_radius, alpha_boost=alpha_boost, **output_options)
+        future = inference_pool.try_submit(_run_sync_refine, source_key, options)
+        if future is not None:
+            try:
+                refined = await asyncio.wrap_future(future)
+            except Exception as exc:
+                # Only a missing object means the cache expired; anything else is a real server error.
+                from app.infrastructure.object_storage import is_missing_object
+
+                if is_missing_object(exc):
+                    raise HTTPException(status_code=410, detail="Cached mask is no longer available") from exc
+                raise
+            metrics.observe_histogram("refine_latency_seconds", time.perf_counter() - started)
+            return Response(content=refined.data, media_type=refined.content_type, headers=_sync_headers(refined))
+        metrics.incr("refine_fallback_saturated_total")
+
+    # No inference involved, so refines go to the default queue regardless of the model lane.
+    refine_id, status, deduplicated = await asyncio.to_thread(
+        _enqueue_deduplicated,
+        queue,
+        "app.tasks.background_jobs.refine_cached_job",
+        submission_fingerprint(
+            "refine", source_key, feather_radius, alpha_boost, json.dumps(output_options, sort_keys=True)
+        ),
+        source_key,
+        original_name,
+        feather_radius,
+        alpha_boost,
+        output_options,
+    )
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": refine_id, "status": status, "deduplicated": deduplicated},
+        headers={"x-rmbg-path": "queue", "Location": f"/api/jobs/{refine_id}"},
+    )
+
+
 @app.post("/api/jobs/{job_id}/retry")
 def retry_job(job_id: str) -> dict[str, str]:
     try:
@@ -289,7 +733,7 @@ def retry_job(job_id: str) -> dict[str, str]:
 
     retry = _enqueue_retry()
     try:
-        requeued = queue.enqueue_call(
+        requeued = _lane_queue(getattr(job, "origin", None)).enqueue_call(
             func=job.func_name,
             args=job.args,
             kwargs=job.kwargs,
@@ -307,7 +751,8 @@ def retry_job(job_id: str) -> dict[str, str]:
 @app.get("/api/failed-jobs")
 def list_failed_jobs(limit: int = 20) -> dict:
     registry = FailedJobRegistry(name=queue.name, connection=redis_connection)
-    job_ids = registry.get_job_ids()[: max(1, min(limit, 100))]
+    # Only the requested slice crosses the wire, not the whole (up to failure_ttl long) registry.
+    job_ids = registry.get_job_ids(0, max(1, min(limit, 100)) - 1)
     items: list[dict] = []
 
     for job_id in job_ids:
@@ -325,17 +770,9 @@ def list_failed_jobs(limit: int = 20) -> dict:
 
 
 @app.get("/api/jobs/{job_id}/download")
-def download_job_result(job_id: str) -> Response:
-    try:
-        job = Job.fetch(job_id, connection=redis_connection)
-    except Exception as exc:  # noqa: BLE001
-        raise HTTPException(status_code=404, detail="Job not found") from exc
-
-    if job.get_status(refresh=True) != "finished":
-        raise HTTPException(status_code=409, detail="Job is not finished")
-
-    result = job.result or {}
-    if not isinstance(result, dict) or "key" not in result:
+async def download_job_result(job_id: str) -> Response:
+    result = await asyncio.to_thread(_finished_result, job_id)
+    if "key" not in result:
         raise HTTPException(status_code=500, detail="Job result key not found")
 
     key = result["key"]
@@ -343,7 +780,8 @@ def download_job_result(job_id: str) -> Response:
     content_type = str(result.get("content_type") or "application/octet-stream")
 
     try:
-        data = storage.get_bytes(key)
+        with metrics.stage_timer("download"):
+            data = await _async_storage().get_bytes(key)
     except Exception as exc:  # noqa: BLE001
         raise HTTPException(status_code=500, detail="Failed to read result from storage") from exc
 
@@ -355,6 +793,42 @@ def download_job_result(job_id: str) -> Response:
     )
 
 
+@app.get("/api/jobs/{job_id}/preview")
+async def download_job_preview(job_id: str) -> Response:
+    job = await asyncio.to_thread(_fetch_job, job_id)
+    meta = job.meta or {}
+    key = meta.get("preview_key")
+    if not key:
+        raise HTTPException(status_code=409, detail="Preview is not available")
+
+    try:
+        data = await _async_storage().get_bytes(str(key))
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=500, detail="Failed to read preview from storage") from exc
+
+    metrics.incr("preview_downloads_total")
+    return Response(content=data, media_type=str(meta.get("preview_content_type") or "image/png"))
+
+
+@app.get("/api/jobs/{job_id}/profile")
+async def download_job_profile(job_id: str) -> Response:
+    job = await asyncio.to_thread(_fetch_job, job_id)
+    key = (job.meta or {}).get("profile_key")
+    if not key:
+        raise HTTPException(status_code=409, detail="Job was not profiled")
+
+    try:
+        data = await _async_storage().get_bytes(str(key))
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=500, detail="Failed to read profile from storage") from exc
+
+    return Response(
+        content=data,
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="profile-{job_id}.json"'},
+    )
+
+
 @app.post("/api/admin/cleanup")
 def run_cleanup() -> dict[str, str]:
     job_id = _enqueue_cleanup_job()
@@ -363,21 +837,16 @@ def run_cleanup() -> dict[str, str]:
 
 @app.get("/api/metrics")
 def get_metrics() -> dict:
-    queue_depth, queue_started, queue_failed = _queue_stats()
+    lanes = _record_queue_gauges()
     snapshot = metrics.snapshot()
-    metrics.set_gauge("queue_depth", queue_depth)
-    metrics.set_gauge("queue_started", queue_started)
-    metrics.set_gauge("queue_failed", queue_failed)
+    snapshot["queue_lanes"] = {lane: asdict(stats) for lane, stats in lanes.items()}
     snapshot["timestamp"] = int(datetime.now(timezone.utc).timestamp())
     return snapshot
 
 
 @app.get("/api/metrics/prometheus")
 def get_prometheus_metrics() -> PlainTextResponse:
-    queue_depth, queue_started, queue_failed = _queue_stats()
-    metrics.set_gauge("queue_depth", queue_depth)
-    metrics.set_gauge("queue_started", queue_started)
-    metrics.set_gauge("queue_failed", queue_failed)
+    _record_queue_gauges()
     return PlainTextResponse(metrics.to_prometheus_text(), media_type="text/plain; version=0.0.4")
 
 
@@ -386,6 +855,21 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/api/ready")
+async def ready() -> JSONResponse:
+    """Readiness: Redis answers a ping now and the storage bucket was reachable during warm-up."""
+    try:
+        redis_ok = bool(await asyncio.to_thread(redis_connection.ping))
+    except RedisError:
+        redis_ok = False
+    checks = {"redis": redis_ok, "storage": readiness["storage"]}
+    is_ready = all(checks.values())
+    return JSONResponse(
+        status_code=200 if is_ready else 503,
+        content={"status": "ready" if is_ready else "starting", "checks": checks},
+    )
+
+
 @app.get("/")
 def root() -> FileResponse:
     return FileResponse("static/index.html")
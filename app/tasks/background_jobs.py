@@ -1,26 +1,48 @@
 from __future__ import annotations
 
 import io
+import json
+import logging
+import random
 import time
 import traceback
 import zipfile
+from datetime import timezone
 from pathlib import Path
 
 from rq import get_current_job
 
 from app.application.remove_background_use_case import (
     RemoveBackgroundOptions,
+    RemoveBackgroundResult,
     RemoveBackgroundUseCase,
+    refine_cutout,
 )
-from app.infrastructure.object_storage import S3ObjectStorage
+from app.config import settings
+from app.infrastructure.dedup import InFlightRegistry
+from app.infrastructure.expiry_index import OutputExpiryIndex
+from app.infrastructure.image_validation import allow_decoding_up_to
+from app.infrastructure.jobs import get_redis_connection
+from app.infrastructure.metrics import metrics
+from app.infrastructure.object_storage import get_storage
+from app.infrastructure.profiling import JobProfiler
 from app.infrastructure.rembg_background_remover import RembgBackgroundRemover
 
-use_case = RemoveBackgroundUseCase(RembgBackgroundRemover())
-storage = S3ObjectStorage()
-try:
-    storage.ensure_bucket()
-except Exception:  # noqa: BLE001
-    pass
+logger = logging.getLogger("rmbg.jobs")
+
+allow_decoding_up_to(settings.max_image_pixels)
+if settings.metrics_shared_enabled:
+    metrics.attach(get_redis_connection(), settings.metrics_flush_interval_seconds)
+remover = RembgBackgroundRemover()
+use_case = RemoveBackgroundUseCase(
+    remover,
+    settings.large_image_pixels,
+    settings.tile_rows,
+    settings.animation_reuse_threshold,
+    stage_timer=metrics.stage_timer,
+)
+storage = get_storage()
+expiry_index = OutputExpiryIndex(get_redis_connection())
 
 
 def _update_job_meta(**entries: str | int | float) -> None:
@@ -31,6 +53,90 @@ def _update_job_meta(**entries: str | int | float) -> None:
     job.save_meta()
 
 
+def _release_inflight() -> None:
+    job = get_current_job()
+    if not job:
+        return
+    fingerprint = (job.meta or {}).get("dedup_fingerprint")
+    if not fingerprint:
+        return
+    try:
+        InFlightRegistry(job.connection, ttl_seconds=settings.dedup_ttl_seconds).release(fingerprint, job.id)
+    except Exception:  # noqa: BLE001
+        pass
+
+
+def _store_output(key: str, data: bytes, content_type: str) -> None:
+    with metrics.stage_timer("upload"):
+        storage.put_bytes(key, data, content_type)
+    _register_expiry(key, len(data))
+
+
+def _register_expiry(key: str, size: int) -> None:
+    try:
+        expiry_index.register(key, time.time() + settings.cleanup_older_than_seconds, size)
+    except Exception:  # noqa: BLE001
+        # The reconciliation scan still finds unregistered objects.
+        pass
+
+
+def _observe_queue_latency() -> None:
+    job = get_current_job()
+    if not job or not job.enqueued_at:
+        return
+    enqueued_ts = job.enqueued_at.replace(tzinfo=timezone.utc).timestamp()
+    metrics.observe_histogram("queue_latency_seconds", max(0.0, time.time() - enqueued_ts))
+
+
+def _publish_preview(job_id: str, result: RemoveBackgroundResult) -> None:
+    # Own prefix, like _source/ and _profile/, so an upload named preview.png cannot collide with it.
+    key = f"jobs/single/{job_id}/_preview/preview.{result.extension}"
+    _store_output(key, result.data, result.content_type)
+    _update_job_meta(progress=50, stage="preview_ready", preview_key=key, preview_content_type=result.content_type)
+    job = get_current_job()
+    if job and job.started_at:
+        started_ts = job.started_at.replace(tzinfo=timezone.utc).timestamp()
+        metrics.observe_histogram("preview_latency_seconds", max(0.0, time.time() - started_ts))
+
+
+def _observe_frames(result: RemoveBackgroundResult, elapsed: float) -> None:
+    if result.frames <= 1:
+        return
+    metrics.incr("animation_frames_total", result.frames)
+    metrics.incr("animation_frames_inferred_total", result.frames_inferred)
+    metrics.observe_histogram("animation_frame_seconds", elapsed / result.frames)
+
+
+def _observe_crop(result: RemoveBackgroundResult) -> None:
+    if result.crop_box is None:
+        return
+    metrics.incr("crop_outputs_total")
+    metrics.incr("crop_pixels_removed_total", result.pixels_removed)
+
+
+def _start_profiler(requested: bool) -> JobProfiler | None:
+    # Unprofiled jobs pay for this check only; the sampler thread and tracemalloc start on demand.
+    if not requested and not (settings.profile_sample_rate > 0 and random.random() < settings.profile_sample_rate):
+        return None
+    profiler = JobProfiler(settings.profile_interval_ms / 1000)
+    profiler.start()
+    return profiler
+
+
+def _publish_profile(profiler: JobProfiler | None, kind: str, job_id: str) -> None:
+    if profiler is None:
+        return
+    profiler.stop()
+    key = f"jobs/{kind}/{job_id}/_profile/profile.json"
+    try:
+        _store_output(key, profiler.to_json(), "application/json")
+        _update_job_meta(profile_key=key)
+        metrics.incr("jobs_profiled_total")
+    except Exception as exc:  # noqa: BLE001
+        # A lost profile must not fail the job it describes.
+        logger.warning("could not store profile for job %s: %s", job_id, exc)
+
+
 def _safe_stem(name: str, fallback: str) -> str:
     stem = Path(name).stem
     safe = "".join(ch for ch in stem if ch.isalnum() or ch in ("-", "_"))
@@ -42,66 +148,167 @@ def process_single_image_job(
     original_name: str,
     feather_radius: float,
     alpha_boost: float,
-) -> dict[str, str]:
+    model: str | None = None,
+    output_options: dict[str, str | int] | None = None,
+    preview: bool = False,
+    profile: bool = False,
+) -> dict[str, str | list[int] | None]:
     job = get_current_job()
     job_id = job.id if job else "sync"
     _update_job_meta(progress=5, stage="prepare", started_at_ts=int(time.time()))
 
+    profiler = _start_profiler(profile)
     try:
-        options = RemoveBackgroundOptions(feather_radius=feather_radius, alpha_boost=alpha_boost)
+        options = RemoveBackgroundOptions(
+            feather_radius=feather_radius, alpha_boost=alpha_boost, model=model, **(output_options or {})
+        )
         _update_job_meta(progress=30, stage="remove_background")
-        output_png = use_case.execute(image_bytes, options)
+        started = time.perf_counter()
+        if preview:
+            result = use_case.execute_progressive(
+                image_bytes, options, settings.preview_max_side, lambda result: _publish_preview(job_id, result)
+            )
+        else:
+            result = use_case.execute(image_bytes, options)
+        _observe_frames(result, time.perf_counter() - started)
+        _observe_crop(result)
 
-        key = f"jobs/single/{job_id}/{_safe_stem(original_name, 'result')}.png"
+        key = f"jobs/single/{job_id}/{_safe_stem(original_name, 'result')}.{result.extension}"
         _update_job_meta(progress=80, stage="upload")
-        storage.put_bytes(key, output_png, "image/png")
+        _store_output(key, result.data, result.content_type)
+        source_key = None
+        if settings.refine_cache_enabled and result.source is not None:
+            # Keep the unrefined cutout so later option tweaks can skip inference (see refine_cached_job).
+            if result.source == result.data:
+                # Default options output the unrefined cutout itself; the result doubles as the cache.
+                source_key = key
+            else:
+                source_key = f"jobs/single/{job_id}/_source/cutout.png"
+                _store_output(source_key, result.source, "image/png")
         _update_job_meta(progress=100, stage="done", finished_at_ts=int(time.time()))
+        _release_inflight()
+        _observe_queue_latency()
     except Exception as exc:  # noqa: BLE001
         _update_job_meta(progress=0, stage="failed", error=str(exc), traceback=traceback.format_exc())
         raise
+    finally:
+        _publish_profile(profiler, "single", job_id)
+        # Fork-per-job horses exit right after this, so push their stage timings now.
+        metrics.flush()
 
+    return _single_result(key, result, source_key)
+
+
+def _single_result(
+    key: str, result: RemoveBackgroundResult, source_key: str | None
+) -> dict[str, str | list[int] | None]:
     return {
         "kind": "single",
         "key": key,
         "filename": Path(key).name,
-        "content_type": "image/png",
+        "content_type": result.content_type,
+        "crop_box": list(result.crop_box) if result.crop_box else None,
+        "source_key": source_key,
+        "frames": result.frames,
     }
 
 
+def refine_cached_job(
+    source_key: str,
+    original_name: str,
+    feather_radius: float,
+    alpha_boost: float,
+    output_options: dict[str, str | int] | None = None,
+) -> dict[str, str | list[int] | None]:
+    """Re-apply refinement options to the cutout cached by an earlier job; no model is loaded."""
+    job = get_current_job()
+    job_id = job.id if job else "sync"
+    _update_job_meta(progress=5, stage="prepare", started_at_ts=int(time.time()))
+
+    try:
+        options = RemoveBackgroundOptions(
+            feather_radius=feather_radius, alpha_boost=alpha_boost, **(output_options or {})
+        )
+        with metrics.stage_timer("download"):
+            cutout = storage.get_bytes(source_key)
+        _update_job_meta(progress=30, stage="refine")
+        result = refine_cutout(cutout, options, metrics.stage_timer)
+        _observe_crop(result)
+
+        key = f"jobs/single/{job_id}/{_safe_stem(original_name, 'result')}.{result.extension}"
+        _update_job_meta(progress=80, stage="upload")
+        _store_output(key, result.data, result.content_type)
+        # Further refines chain off the same cutout, so push its expiry out with the new output.
+        _register_expiry(source_key, len(cutout))
+        _update_job_meta(progress=100, stage="done", finished_at_ts=int(time.time()))
+        _release_inflight()
+        _observe_queue_latency()
+    except Exception as exc:  # noqa: BLE001
+        _update_job_meta(progress=0, stage="failed", error=str(exc), traceback=traceback.format_exc())
+        raise
+    finally:
+        # Fork-per-job horses exit right after this, so push their stage timings now.
+        metrics.flush()
+
+    return _single_result(key, result, source_key)
+
+
 def process_batch_images_job(
     files_payload: list[dict[str, bytes | str]],
     feather_radius: float,
     alpha_boost: float,
+    model: str | None = None,
+    output_options: dict[str, str | int] | None = None,
+    profile: bool = False,
 ) -> dict[str, str]:
     job = get_current_job()
     job_id = job.id if job else "sync"
     total = max(1, len(files_payload))
     _update_job_meta(progress=3, stage="prepare", total=total, current=0, started_at_ts=int(time.time()))
 
+    profiler = _start_profiler(profile)
     try:
-        options = RemoveBackgroundOptions(feather_radius=feather_radius, alpha_boost=alpha_boost)
+        options = RemoveBackgroundOptions(
+            feather_radius=feather_radius, alpha_boost=alpha_boost, model=model, **(output_options or {})
+        )
         output_buffer = io.BytesIO()
+        crop_boxes: dict[str, list[int] | None] = {}
 
-        with zipfile.ZipFile(output_buffer, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        # Every output format is already compressed; deflating it again only burns CPU.
+        with zipfile.ZipFile(output_buffer, mode="w", compression=zipfile.ZIP_STORED) as archive:
             for index, payload in enumerate(files_payload, start=1):
                 name = str(payload.get("name") or f"image-{index}.png")
                 image_bytes = payload["bytes"]
                 if not isinstance(image_bytes, bytes):
                     raise ValueError(f"Invalid payload bytes for {name}")
 
-                output_png = use_case.execute(image_bytes, options)
-                safe_name = f"{_safe_stem(name, f'image-{index}')}.png"
-                archive.writestr(safe_name, output_png)
+                started = time.perf_counter()
+                result = use_case.execute(image_bytes, options)
+                _observe_frames(result, time.perf_counter() - started)
+                _observe_crop(result)
+                safe_name = f"{_safe_stem(name, f'image-{index}')}.{result.extension}"
+                archive.writestr(safe_name, result.data)
+                if options.crop_to_content:
+                    crop_boxes[safe_name] = list(result.crop_box) if result.crop_box else None
                 progress = int((index / total) * 90)
                 _update_job_meta(progress=progress, stage="processing", total=total, current=index)
 
+            if options.crop_to_content:
+                # Offsets of each cropped entry within its source image, so clients can re-place them.
+                archive.writestr("crops.json", json.dumps(crop_boxes, indent=2))
+
         key = f"jobs/batch/{job_id}/removed-backgrounds.zip"
         _update_job_meta(progress=95, stage="upload")
-        storage.put_bytes(key, output_buffer.getvalue(), "application/zip")
+        _store_output(key, output_buffer.getvalue(), "application/zip")
         _update_job_meta(progress=100, stage="done", finished_at_ts=int(time.time()))
+        _release_inflight()
     except Exception as exc:  # noqa: BLE001
         _update_job_meta(progress=0, stage="failed", error=str(exc), traceback=traceback.format_exc())
         raise
+    finally:
+        _publish_profile(profiler, "batch", job_id)
+        # Fork-per-job horses exit right after this, so push their stage timings now.
+        metrics.flush()
 
     return {
         "kind": "batch",
@@ -1,35 +1,137 @@
 from __future__ import annotations
 
+import logging
 import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 
 from app.config import settings
-from app.infrastructure.object_storage import S3ObjectStorage
+from app.infrastructure.expiry_index import OutputExpiryIndex
+from app.infrastructure.jobs import get_redis_connection
+from app.infrastructure.metrics import metrics
+from app.infrastructure.object_storage import get_storage
 
+logger = logging.getLogger("rmbg.maintenance")
 
-storage = S3ObjectStorage()
-try:
-    storage.ensure_bucket()
-except Exception:  # noqa: BLE001
-    pass
+if settings.metrics_shared_enabled:
+    metrics.attach(get_redis_connection(), settings.metrics_flush_interval_seconds)
+storage = get_storage()
+expiry_index = OutputExpiryIndex(get_redis_connection())
 
+Batch = list[tuple[str, int]]
 
-def cleanup_expired_outputs_job(older_than_seconds: int) -> dict[str, int]:
+
+def _delete_batch(batch: Batch) -> tuple[Batch, set[str]]:
+    try:
+        return batch, set(storage.delete_objects([key for key, _ in batch]))
+    except Exception as exc:  # noqa: BLE001
+        # Report the whole batch as failed so its already-popped index entries are put back.
+        logger.warning("DeleteObjects failed for %d keys: %s", len(batch), exc)
+        return batch, {key for key, _ in batch}
+
+
+def _delete_batches(batches: Iterable[Batch]) -> tuple[list[str], int, Batch]:
+    """Issue DeleteObjects calls concurrently; returns deleted keys, bytes reclaimed and failures."""
+    deleted: list[str] = []
+    reclaimed = 0
+    failed: Batch = []
+
+    def collect(done: set[Future]) -> None:
+        nonlocal reclaimed
+        for future in done:
+            batch, batch_failed = future.result()
+            for key, size in batch:
+                if key in batch_failed:
+                    failed.append((key, size))
+                else:
+                    deleted.append(key)
+                    reclaimed += size
+
+    concurrency = max(1, settings.cleanup_delete_concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending: set[Future] = set()
+        for batch in batches:
+            # Bound the batches in flight so a huge backlog never piles up in memory.
+            if len(pending) >= concurrency * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(executor.submit(_delete_batch, batch))
+        collect(wait(pending).done)
+
+    return deleted, reclaimed, failed
+
+
+def _indexed_expired_batches(now: float) -> Iterator[Batch]:
+    while True:
+        batch = expiry_index.pop_expired(now, limit=1000)
+        if not batch:
+            return
+        yield batch
+
+
+def _listed_expired_batches(prefix: str, now: int, older_than_seconds: int, scanned: list[int]) -> Iterator[Batch]:
+    batch: Batch = []
+    for item in storage.iter_job_objects(prefix=prefix):
+        scanned[0] += 1
+        if now - int(item["last_modified"].timestamp()) < older_than_seconds:
+            continue
+        batch.append((str(item["key"]), int(item.get("size", 0))))
+        if len(batch) >= 1000:
+            if expired := _without_live_entries(batch, now):
+                yield expired
+            batch = []
+    if batch and (expired := _without_live_entries(batch, now)):
+        yield expired
+
+
+def _without_live_entries(batch: Batch, now: int) -> Batch:
+    # LastModified is the upload time, but refines push a cached cutout's expiry out in the index only.
+    expiries = expiry_index.expires_at([key for key, _ in batch])
+    return [entry for entry, expires_at in zip(batch, expiries) if expires_at is None or expires_at <= now]
+
+
+def cleanup_expired_outputs_job(older_than_seconds: int, reconcile: bool = False) -> dict[str, int]:
+    """Delete expired outputs recorded in the expiry index.
+
+    With ``reconcile`` the prefixes are also listed and objects older than ``older_than_seconds``
+    removed, which catches anything uploaded before the index existed or whose registration failed.
+    """
+    started = time.perf_counter()
     now = int(time.time())
-    deleted = 0
-    scanned = 0
-    by_prefix: dict[str, int] = {}
-
-    for prefix in settings.cleanup_prefixes:
-        prefix_deleted = 0
-        for item in storage.iter_job_objects(prefix=prefix):
-            scanned += 1
-            modified_ts = int(item["last_modified"].timestamp())
-            age_seconds = now - modified_ts
-            if age_seconds < older_than_seconds:
-                continue
-            storage.delete_object(item["key"])
-            deleted += 1
-            prefix_deleted += 1
-        by_prefix[prefix] = prefix_deleted
-
-    return {"scanned": scanned, "deleted": deleted, "prefixes": by_prefix}
+    try:
+        deleted, reclaimed, failed = _delete_batches(_indexed_expired_batches(now))
+        # Put failures back so the next run retries them instead of leaking the objects.
+        expiry_index.register_many(failed, now)
+        index_deleted = len(deleted)
+        total_deleted = index_deleted
+
+        scanned = [0]
+        by_prefix: dict[str, int] = {}
+        if reconcile:
+            for prefix in settings.cleanup_prefixes:
+                removed, prefix_reclaimed, _ = _delete_batches(
+                    _listed_expired_batches(prefix, now, older_than_seconds, scanned)
+                )
+                expiry_index.forget(removed)
+                by_prefix[prefix] = len(removed)
+                total_deleted += len(removed)
+                reclaimed += prefix_reclaimed
+
+        elapsed = max(1e-6, time.perf_counter() - started)
+        objects_per_second = round(total_deleted / elapsed, 1)
+        metrics.incr("cleanup_objects_deleted_total", total_deleted)
+        metrics.incr("cleanup_bytes_reclaimed_total", reclaimed)
+    finally:
+        # Fork-per-job horses exit right after this, so push the cleanup counters now.
+        metrics.flush()
+
+    return {
+        "scanned": scanned[0],
+        "deleted": total_deleted,
+        "index_deleted": index_deleted,
+        "failed": len(failed),
+        "bytes_reclaimed": reclaimed,
+        "elapsed_ms": int(elapsed * 1000),
+        "objects_per_second": objects_per_second,
+        "prefixes": by_prefix,
+    }
@@ -0,0 +1,7 @@
+from __future__ import annotations
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``values``; ``fraction`` is in [0, 1]."""
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))]
@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from scripts.bench_stats import percentile
+
+
+def free_port() -> int:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def import_seconds() -> float:
+    code = "import time; t = time.perf_counter(); import app.presentation.api; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def wait_for(url: str, deadline: float, want_ok: bool) -> float | None:
+    while time.perf_counter() < deadline:
+        try:
+            response = requests.get(url, timeout=1)
+            if response.ok or not want_ok:
+                return time.perf_counter()
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    return None
+
+
+def boot_once(timeout: float) -> dict[str, float | None]:
+    """Start uvicorn, then time the first served /api/health and the first 200 from /api/ready."""
+    port = free_port()
+    base = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        env={**os.environ, "PYTHONUNBUFFERED": "1"},
+    )
+    try:
+        deadline = started + timeout
+        first_request = wait_for(f"{base}/api/health", deadline, want_ok=True)
+        ready = wait_for(f"{base}/api/ready", deadline, want_ok=True) if first_request else None
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {
+        "first_request_sec": round(first_request - started, 3) if first_request else None,
+        "ready_sec": round(ready - started, 3) if ready else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="API cold start: import time, first served request, readiness")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60, help="seconds to wait for each boot")
+    args = parser.parse_args()
+
+    imports = [import_seconds() for _ in range(args.runs)]
+    boots = [boot_once(args.timeout) for _ in range(args.runs)]
+
+    report: dict[str, float | int | None] = {
+        "runs": args.runs,
+        "import_p50_sec": round(percentile(imports, 0.50), 3),
+    }
+    for name in ("first_request_sec", "ready_sec"):
+        values = [boot[name] for boot in boots if boot[name] is not None]
+        report[f"{name.removesuffix('_sec')}_p50_sec"] = round(percentile(values, 0.50), 3) if values else None
+        report[f"{name.removesuffix('_sec')}_max_sec"] = round(max(values), 3) if values else None
+        report[f"{name.removesuffix('_sec')}_timeouts"] = args.runs - len(values)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
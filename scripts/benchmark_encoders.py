@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.application.remove_background_use_case import RemoveBackgroundOptions, encode_cutout
+
+
+def make_cutout(megapixels: float, subject: float = 0.66, seed: int = 7) -> Image.Image:
+    """A noisy photo-like RGBA cutout: a textured subject covering ``subject`` of each side."""
+    side = max(16, int((megapixels * 1_000_000) ** 0.5))
+    rng = random.Random(seed)
+    rgb = Image.effect_noise((side, side), 48).convert('RGB')
+    draw = ImageDraw.Draw(rgb)
+    for _ in range(64):
+        x, y = rng.randrange(side), rng.randrange(side)
+        r = rng.randrange(side // 40 + 1, side // 6 + 2)
+        draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+    alpha = Image.new('L', (side, side), 0)
+    margin = int(side * (1 - subject) / 2)
+    ImageDraw.Draw(alpha).ellipse((margin, margin, side - margin, side - margin), fill=255)
+    rgba = rgb.convert('RGBA')
+    rgba.putalpha(alpha.filter(ImageFilter.GaussianBlur(radius=3)))
+    return rgba
+
+
+def timed_encode(image: Image.Image, fmt: str, level: int, quality: int, repeat: int) -> tuple[float, int]:
+    options = RemoveBackgroundOptions(output_format=fmt, png_compress_level=level, webp_quality=quality)
+    timings = []
+    size = 0
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        size = len(encode_cutout(image, options))
+        timings.append(time.perf_counter() - started)
+    return min(timings), size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--megapixels', type=float, default=4.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--png-levels', default='1,3,6,9')
+    parser.add_argument('--webp-quality', type=int, default=90)
+    parser.add_argument('--subject', type=float, default=0.66, help='fraction of each side the subject covers')
+    parser.add_argument('--crop', action='store_true', help='also encode the alpha-bbox crop and report savings')
+    args = parser.parse_args()
+
+    image = make_cutout(args.megapixels, args.subject)
+    cropped = image.crop(image.getchannel('A').getbbox() or (0, 0, image.width, image.height))
+    cases = [('png', int(level)) for level in args.png_levels.split(',') if level.strip()]
+    cases += [('mask', 1), ('webp', 0), ('webp-lossy', 0)]
+
+    for fmt, level in cases:
+        elapsed, size = timed_encode(image, fmt, level, args.webp_quality, args.repeat)
+        report: dict[str, float | int | str | None] = {
+            'format': fmt,
+            'png_compress_level': level if fmt in {'png', 'mask'} else None,
+            'megapixels': round(image.width * image.height / 1_000_000, 2),
+            'encode_ms': round(elapsed * 1000, 1),
+            'bytes': size,
+        }
+        if args.crop:
+            cropped_elapsed, cropped_size = timed_encode(cropped, fmt, level, args.webp_quality, args.repeat)
+            report['cropped_megapixels'] = round(cropped.width * cropped.height / 1_000_000, 2)
+            report['bytes_saved'] = size - cropped_size
+            report['encode_ms_saved'] = round((elapsed - cropped_elapsed) * 1000, 1)
+        print(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,41 +2,100 @@ from __future__ import annotations
 
 import argparse
 import io
+import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
 import requests
 from PIL import Image, ImageDraw
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-def make_image() -> bytes:
-    img = Image.new('RGB', (256, 256), 'white')
+from scripts.bench_stats import percentile
+
+
+def make_image(size: int = 256) -> bytes:
+    img = Image.new('RGB', (size, size), 'white')
     draw = ImageDraw.Draw(img)
-    draw.rectangle((40, 40, 220, 220), fill='green')
+    draw.rectangle((size // 6, size // 6, size * 5 // 6, size * 5 // 6), fill='green')
     out = io.BytesIO()
     img.save(out, format='PNG')
     return out.getvalue()
 
 
+def wait_for_job(url: str, job_id: str, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        status = requests.get(f"{url}/api/jobs/{job_id}", timeout=10).json()['status']
+        if status == 'finished':
+            requests.get(f"{url}/api/jobs/{job_id}/download", timeout=30).raise_for_status()
+            return
+        if status in {'failed', 'canceled', 'stopped'}:
+            raise RuntimeError(f"job {job_id} ended as {status}")
+        time.sleep(0.05)
+    raise TimeoutError(f"job {job_id} did not finish in {timeout}s")
+
+
+def run_one(args: argparse.Namespace, image: bytes, index: int) -> tuple[str, float]:
+    # A distinct filename per request keeps in-flight dedup from hiding the real cost.
+    data = {'feather_radius': '0', 'alpha_boost': '1'}
+    files = {'file': (f'bench-{index}.png', image, 'image/png')}
+    started = time.perf_counter()
+
+    if args.mode == 'submit':
+        resp = requests.post(f"{args.url}/api/jobs/remove-bg", files=files, data=data, timeout=30)
+        resp.raise_for_status()
+        return 'submit', time.perf_counter() - started
+
+    if args.mode == 'sync':
+        resp = requests.post(f"{args.url}/api/remove-bg", files=files, data=data, timeout=120)
+        resp.raise_for_status()
+        if resp.status_code == 200:
+            return 'sync', time.perf_counter() - started
+        job_id = resp.json()['job_id']
+    else:
+        resp = requests.post(f"{args.url}/api/jobs/remove-bg", files=files, data=data, timeout=30)
+        resp.raise_for_status()
+        job_id = resp.json()['job_id']
+
+    wait_for_job(args.url, job_id, args.job_timeout)
+    return 'queue', time.perf_counter() - started
+
+
 def main() -> None:
     parser = argparse.ArgumentParser()
     parser.add_argument('--url', default='http://127.0.0.1:8000')
     parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=1)
+    parser.add_argument('--size', type=int, default=256, help='square test image side in pixels')
+    parser.add_argument(
+        '--mode',
+        choices=['submit', 'queue', 'sync'],
+        default='submit',
+        help='submit: enqueue only; queue: submit, poll and download; sync: POST /api/remove-bg',
+    )
+    parser.add_argument('--job-timeout', type=float, default=300)
     args = parser.parse_args()
 
-    image = make_image()
+    image = make_image(args.size)
     started = time.time()
-
-    for _ in range(args.count):
-        resp = requests.post(
-            f"{args.url}/api/jobs/remove-bg",
-            files={'file': ('bench.png', image, 'image/png')},
-            data={'feather_radius': '0', 'alpha_boost': '1'},
-            timeout=30,
-        )
-        resp.raise_for_status()
-
+    with ThreadPoolExecutor(max_workers=max(1, args.concurrency)) as pool:
+        results = list(pool.map(lambda index: run_one(args, image, index), range(args.count)))
     elapsed = time.time() - started
-    print({'submitted': args.count, 'elapsed_sec': round(elapsed, 2), 'rps': round(args.count / elapsed, 2)})
+
+    report: dict[str, float | int | str] = {
+        'mode': args.mode,
+        'requests': args.count,
+        'elapsed_sec': round(elapsed, 2),
+        'rps': round(args.count / elapsed, 2),
+    }
+    for path in sorted({path for path, _ in results}):
+        latencies = [latency for p, latency in results if p == path]
+        report[f'{path}_count'] = len(latencies)
+        report[f'{path}_p50_ms'] = round(percentile(latencies, 0.50) * 1000, 1)
+        report[f'{path}_p99_ms'] = round(percentile(latencies, 0.99) * 1000, 1)
+    print(report)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,293 @@
+"""End-to-end job benchmark that needs no running stack.
+
+Jobs go through real rq queues and the real task functions, with local stand-ins around them:
+fakeredis (or a local redis-server via --redis-url), an in-memory object store (or the configured S3
+endpoint, e.g. a moto server or MinIO, via --storage s3) and a synthetic remover that sleeps for a
+configurable inference time and returns an elliptical mask. Each scenario runs in its own process so
+its RSS high-water mark is its own.
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.domain.background_remover import BackgroundRemover
+from scripts.bench_stats import percentile
+
+# Reported per scenario and checked by --compare; True means higher is better.
+COMPARED_METRICS = {
+    "images_per_sec": True,
+    "e2e_p50_ms": False,
+    "e2e_p99_ms": False,
+    "service_p50_ms": False,
+    "rss_high_water_mb": False,
+}
+
+
+class SyntheticRemover(BackgroundRemover):
+    """Deterministic stand-in for rembg: fixed latency plus a per-megapixel cost, ellipse-shaped mask."""
+
+    def __init__(self, inference_ms: float, per_megapixel_ms: float) -> None:
+        self._inference_ms = inference_ms
+        self._per_megapixel_ms = per_megapixel_ms
+
+    def remove(self, image_bytes: bytes, model_name: str | None = None) -> bytes:
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            rgba = image.convert("RGBA")
+        cutout = Image.composite(rgba, Image.new("RGBA", rgba.size, 0), self.predict_mask(rgba, model_name))
+        output = io.BytesIO()
+        cutout.save(output, format="PNG")
+        return output.getvalue()
+
+    def predict_mask(self, image: Image.Image, model_name: str | None = None) -> Image.Image:  # noqa: ARG002
+        # Sleeping releases the GIL the way onnxruntime does, so worker threads overlap like real ones.
+        time.sleep((self._inference_ms + self._per_megapixel_ms * image.width * image.height / 1e6) / 1000)
+        mask = Image.new("L", image.size, 0)
+        ImageDraw.Draw(mask).ellipse(
+            (image.width // 6, image.height // 6, image.width * 5 // 6, image.height * 5 // 6), fill=255
+        )
+        return mask
+
+
+class InMemoryStorage:
+    def __init__(self) -> None:
+        self._objects: dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def put_bytes(self, key: str, data: bytes, content_type: str) -> None:  # noqa: ARG002
+        with self._lock:
+            self._objects[key] = data
+
+    def get_bytes(self, key: str) -> bytes:
+        with self._lock:
+            return self._objects[key]
+
+    def delete_objects(self, keys: list[str]) -> list[str]:
+        with self._lock:
+            for key in keys:
+                self._objects.pop(key, None)
+        return []
+
+    def ensure_bucket(self) -> None:
+        pass
+
+
+def make_image(size: int) -> bytes:
+    img = Image.new("RGB", (size, size), "white")
+    draw = ImageDraw.Draw(img)
+    draw.rectangle((size // 6, size // 6, size * 5 // 6, size * 5 // 6), fill="green")
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+
+def connect(redis_url: str):
+    if redis_url:
+        from redis import Redis
+
+        return Redis.from_url(redis_url)
+    try:
+        import fakeredis
+    except ImportError as exc:
+        raise SystemExit("fakeredis is not installed: pip install fakeredis, or pass --redis-url") from exc
+    return fakeredis.FakeRedis()
+
+
+def run_scenario(args: argparse.Namespace, concurrency: int, batch_size: int) -> dict[str, float | int | str]:
+    from app.config import settings
+    from app.infrastructure import object_storage
+
+    # Set up before the task module is imported, which would otherwise reach for S3 and Redis.
+    settings.metrics_shared_enabled = False
+    if args.storage == "memory":
+        object_storage._shared_storage = InMemoryStorage()
+
+    from rq import Queue, SimpleWorker
+    from rq.exceptions import DequeueTimeout
+    from rq.timeouts import TimerDeathPenalty
+
+    from app.application.remove_background_use_case import RemoveBackgroundUseCase
+    from app.infrastructure.expiry_index import OutputExpiryIndex
+    from app.tasks import background_jobs
+
+    connection = connect(args.redis_url)
+    connection.flushdb()
+    background_jobs.use_case = RemoveBackgroundUseCase(
+        SyntheticRemover(args.inference_ms, args.per_megapixel_ms),
+        settings.large_image_pixels,
+        settings.tile_rows,
+        settings.animation_reuse_threshold,
+    )
+    background_jobs.expiry_index = OutputExpiryIndex(connection)
+    queue = Queue("rmbg-bench", connection=connection)
+
+    image = make_image(args.size)
+    jobs = []
+    submit_interval = 1.0 / args.rate if args.rate > 0 else 0.0
+
+    def submit() -> None:
+        for index in range(args.jobs):
+            if batch_size > 1:
+                payload = [{"name": f"bench-{index}-{n}.png", "bytes": image} for n in range(batch_size)]
+                jobs.append(
+                    queue.enqueue("app.tasks.background_jobs.process_batch_images_job", payload, 0.0, 1.0)
+                )
+            else:
+                jobs.append(
+                    queue.enqueue(
+                        "app.tasks.background_jobs.process_single_image_job", image, f"bench-{index}.png", 0.0, 1.0
+                    )
+                )
+            if submit_interval:
+                time.sleep(submit_interval)
+
+    def work(index: int) -> None:
+        # One SimpleWorker per thread; the timer death penalty does not need the main thread's signals.
+        worker = SimpleWorker([queue], name=f"bench-{index}", connection=connection)
+        worker.death_penalty_class = TimerDeathPenalty
+        while True:
+            try:
+                job, job_queue = Queue.dequeue_any([queue], timeout=1, connection=connection)
+            except DequeueTimeout:
+                if not submitter.is_alive():
+                    return
+                continue
+            worker.execute_job(job, job_queue)
+
+    rss_start_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    submitter = threading.Thread(target=submit)
+    submitter.start()
+    workers = [threading.Thread(target=work, args=(index,)) for index in range(concurrency)]
+    for thread in workers:
+        thread.start()
+    for thread in [submitter, *workers]:
+        thread.join()
+
+    waits, services, totals = [], [], []
+    failed = 0
+    for job in jobs:
+        job.refresh()
+        if job.get_status() != "finished":
+            failed += 1
+            continue
+        waits.append((job.started_at - job.enqueued_at).total_seconds())
+        services.append((job.ended_at - job.started_at).total_seconds())
+        totals.append((job.ended_at - job.enqueued_at).total_seconds())
+    # From the first enqueue to the last completion, so the workers' idle shutdown poll is not counted.
+    ended = [job.ended_at for job in jobs if job.ended_at is not None]
+    first_enqueued = min(job.enqueued_at for job in jobs)
+    elapsed = max(1e-6, (max(ended) - first_enqueued).total_seconds()) if ended else 1e-6
+
+    report: dict[str, float | int | str] = {
+        "scenario": f"c{concurrency}-b{batch_size}",
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "jobs": args.jobs,
+        "failed": failed,
+        "elapsed_sec": round(elapsed, 3),
+        "jobs_per_sec": round(len(totals) / elapsed, 2),
+        "images_per_sec": round(len(totals) * batch_size / elapsed, 2),
+        # ru_maxrss is in KiB on Linux; the start value is the footprint after imports.
+        "rss_start_mb": round(rss_start_kb / 1024, 1),
+        "rss_high_water_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    for name, values in (("e2e", totals), ("queue_wait", waits), ("service", services)):
+        if values:
+            report[f"{name}_p50_ms"] = round(percentile(values, 0.50) * 1000, 1)
+            report[f"{name}_p95_ms"] = round(percentile(values, 0.95) * 1000, 1)
+            report[f"{name}_p99_ms"] = round(percentile(values, 0.99) * 1000, 1)
+    return report
+
+
+def _scenario_process(args: argparse.Namespace, concurrency: int, batch_size: int, results) -> None:
+    results.put(run_scenario(args, concurrency, batch_size))
+
+
+def compare(baseline: dict, current: dict, tolerance: float) -> list[str]:
+    """Regressions of COMPARED_METRICS beyond ``tolerance`` (a fraction) between matching scenarios."""
+    previous = {scenario["scenario"]: scenario for scenario in baseline["scenarios"]}
+    regressions = []
+    for scenario in current["scenarios"]:
+        old = previous.get(scenario["scenario"])
+        if old is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if not old.get(metric) or metric not in scenario:
+                continue
+            change = (scenario[metric] - old[metric]) / old[metric]
+            if (-change if higher_is_better else change) > tolerance:
+                regressions.append(f"{scenario['scenario']} {metric}: {old[metric]} -> {scenario[metric]} ({change:+.1%})")
+    return regressions
+
+
+def parse_ints(value: str) -> list[int]:
+    return [int(x) for x in value.split(",") if x.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline end-to-end job benchmark with local stand-ins")
+    parser.add_argument("--jobs", type=int, default=40, help="jobs per scenario")
+    parser.add_argument("--concurrency", type=parse_ints, default=[1, 2, 4], help="worker threads, comma-separated")
+    parser.add_argument("--batch-sizes", type=parse_ints, default=[1, 8], help="images per job; 1 = single-image jobs")
+    parser.add_argument("--size", type=int, default=512, help="square test image side in pixels")
+    parser.add_argument("--inference-ms", type=float, default=50.0)
+    parser.add_argument("--per-megapixel-ms", type=float, default=0.0)
+    parser.add_argument("--rate", type=float, default=0.0, help="submissions per second; 0 enqueues all at once")
+    parser.add_argument("--redis-url", default="", help="use this Redis instead of fakeredis")
+    parser.add_argument("--storage", choices=["memory", "s3"], default="memory")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --output run")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed regression before --compare fails")
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("fork")
+    scenarios = []
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            results = context.Queue()
+            process = context.Process(target=_scenario_process, args=(args, concurrency, batch_size, results))
+            process.start()
+            report = results.get()
+            process.join()
+            print(report)
+            scenarios.append(report)
+
+    document = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "config": {
+            key: getattr(args, key)
+            for key in ("jobs", "size", "inference_ms", "per_megapixel_ms", "rate", "storage")
+        },
+        "scenarios": scenarios,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(document, handle, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as handle:
+            regressions = compare(json.load(handle), document, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
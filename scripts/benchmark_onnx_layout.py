@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def make_image(size: int) -> bytes:
+    img = Image.new('RGB', (size, size), 'white')
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((size // 5, size // 5, size * 4 // 5, size * 4 // 5), fill='green')
+    out = io.BytesIO()
+    img.save(out, format='PNG')
+    return out.getvalue()
+
+
+def candidate_layouts(cpus: int, max_processes: int) -> list[tuple[int, int]]:
+    layouts: list[tuple[int, int]] = []
+    processes = 1
+    while processes <= min(cpus, max_processes):
+        layouts.append((processes, max(1, cpus // processes)))
+        processes *= 2
+    if min(cpus, max_processes) not in {p for p, _ in layouts}:
+        count = min(cpus, max_processes)
+        layouts.append((count, max(1, cpus // count)))
+    return layouts
+
+
+def run_layout_member(index: int, threads: int, model: str, image: bytes, iterations: int, pin: bool) -> float:
+    # Spawned children import settings fresh, so the layout is applied before any session exists.
+    os.environ['ONNX_INTRA_OP_THREADS'] = str(threads)
+    if pin and hasattr(os, 'sched_setaffinity'):
+        from worker import pin_to_cores
+
+        pin_to_cores(index, threads)
+
+    from rembg import remove
+
+    from app.infrastructure.rembg_background_remover import create_session
+
+    session = create_session(model)
+    remove(image, session=session)
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        remove(image, session=session)
+    return time.perf_counter() - started
+
+
+def measure_layout(processes: int, threads: int, args: argparse.Namespace, image: bytes) -> dict[str, float | int]:
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes) as pool:
+        elapsed = pool.starmap(
+            run_layout_member,
+            [(index + 1, threads, args.model, image, args.iterations, args.pin) for index in range(processes)],
+        )
+    wall = max(elapsed)
+    images = processes * args.iterations
+    return {
+        'processes': processes,
+        'threads_per_process': threads,
+        'images': images,
+        'wall_sec': round(wall, 3),
+        'images_per_sec': round(images / wall, 3),
+        'mean_latency_ms': round(sum(elapsed) / images * 1000, 1),
+    }
+
+
+def main() -> None:
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+    parser = argparse.ArgumentParser(description='Sweep worker process x onnxruntime thread layouts.')
+    parser.add_argument('--model', default='u2net')
+    parser.add_argument('--size', type=int, default=1024)
+    parser.add_argument('--iterations', type=int, default=8, help='timed inferences per process')
+    parser.add_argument('--max-processes', type=int, default=cpus)
+    parser.add_argument('--pin', action='store_true', help='pin each process to its own cores')
+    parser.add_argument('--output', help='write the full sweep as JSON')
+    args = parser.parse_args()
+
+    image = make_image(args.size)
+    results = []
+    for processes, threads in candidate_layouts(cpus, args.max_processes):
+        result = measure_layout(processes, threads, args, image)
+        print(result, flush=True)
+        results.append(result)
+
+    best = max(results, key=lambda item: item['images_per_sec'])
+    recommendation = {
+        'cpus': cpus,
+        'WORKER_MAX_PROCESSES': best['processes'],
+        'ONNX_INTRA_OP_THREADS': best['threads_per_process'],
+        'WORKER_CPU_AFFINITY': str(args.pin).lower(),
+        'images_per_sec': best['images_per_sec'],
+    }
+    print({'recommended': recommendation})
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'results': results, 'recommended': recommendation}, indent=2))
+
+
+if __name__ == '__main__':
+    main()
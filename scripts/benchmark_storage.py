@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import argparse
+import io
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from boto3.s3.transfer import TransferConfig
+from botocore.client import Config
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings
+from app.infrastructure.object_storage import S3ObjectStorage, build_client_config, build_transfer_config
+from scripts.bench_stats import percentile
+
+
+def baseline_storage() -> S3ObjectStorage:
+    # What the app used before: botocore defaults (10 pooled connections) and single-request transfers.
+    return S3ObjectStorage(
+        client_config=Config(signature_version="s3v4", s3={"addressing_style": settings.s3_addressing_style}),
+        transfer_config=TransferConfig(multipart_threshold=1 << 62),
+    )
+
+
+def run(storage: S3ObjectStorage, payload: bytes, count: int, concurrency: int) -> dict[str, float]:
+    prefix = f"bench/storage/{uuid.uuid4().hex}"
+    keys = [f"{prefix}/{index}.bin" for index in range(count)]
+    large = len(payload) >= settings.s3_multipart_threshold_mb * 1024 * 1024
+
+    def upload(key: str) -> float:
+        started = time.perf_counter()
+        storage.put_bytes(key, payload, "application/octet-stream")
+        return time.perf_counter() - started
+
+    def download(key: str) -> float:
+        started = time.perf_counter()
+        if large:
+            storage.download_fileobj(key, io.BytesIO())
+        else:
+            storage.get_bytes(key)
+        return time.perf_counter() - started
+
+    report: dict[str, float] = {}
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        for name, operation in (("upload", upload), ("download", download)):
+            started = time.perf_counter()
+            latencies = list(pool.map(operation, keys))
+            elapsed = time.perf_counter() - started
+            report[f"{name}_mb_per_sec"] = round(len(payload) * count / elapsed / (1024 * 1024), 1)
+            report[f"{name}_p50_ms"] = round(percentile(latencies, 0.50) * 1000, 1)
+            report[f"{name}_p99_ms"] = round(percentile(latencies, 0.99) * 1000, 1)
+
+    storage.delete_objects(keys)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Upload/download throughput against the configured S3 endpoint")
+    parser.add_argument("--size-kb", type=int, default=512)
+    parser.add_argument("--count", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--client", choices=["baseline", "tuned", "both"], default="both")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size_kb * 1024)
+    clients = {
+        "baseline": baseline_storage,
+        "tuned": lambda: S3ObjectStorage(build_client_config(), build_transfer_config()),
+    }
+    for name in (["baseline", "tuned"] if args.client == "both" else [args.client]):
+        storage = clients[name]()
+        storage.ensure_bucket()
+        report: dict[str, float | int | str] = {"client": name, "size_kb": args.size_kb, "count": args.count}
+        report.update(run(storage, payload, args.count, args.concurrency))
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import onnxruntime as ort
+from rembg.sessions import sessions_class
+
+from app.infrastructure.rembg_background_remover import variant_model_path
+
+
+def quantize_int8(source: Path, target: Path) -> None:
+    # Needs the `onnx` package, which the runtime image does not ship: `pip install onnx`.
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Shape inference + folding first, so more Conv/MatMul nodes qualify for INT8 kernels.
+        prepared = Path(workdir) / "prepared.onnx"
+        quant_pre_process(str(source), str(prepared))
+        quantize_dynamic(str(prepared), str(target), weight_type=QuantType.QUInt8)
+
+
+def serialize_optimized(source: Path, target: Path) -> None:
+    # EXTENDED stays portable across CPUs; ALL would bake in layout transforms for this host only.
+    sess_opts = ort.SessionOptions()
+    sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    sess_opts.optimized_model_filepath = str(target)
+    ort.InferenceSession(str(source), sess_options=sess_opts, providers=["CPUExecutionProvider"])
+
+
+BUILDERS = {
+    "int8": quantize_int8,
+    "optimized": serialize_optimized,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build INT8 and pre-optimized variants of rembg models.")
+    parser.add_argument("--models", default="u2net,u2netp,isnet-general-use,u2net_human_seg")
+    parser.add_argument("--variants", default="int8,optimized")
+    parser.add_argument("--force", action="store_true", help="rebuild variants that already exist")
+    args = parser.parse_args()
+
+    classes = {session_class.name(): session_class for session_class in sessions_class}
+    for model_name in [x.strip() for x in args.models.split(",") if x.strip()]:
+        session_class = classes.get(model_name)
+        if session_class is None:
+            raise SystemExit(f"unknown model '{model_name}'")
+        source = Path(session_class.download_models())
+
+        for variant in [x.strip() for x in args.variants.split(",") if x.strip()]:
+            if variant not in BUILDERS:
+                raise SystemExit(f"unknown variant '{variant}', expected one of {sorted(BUILDERS)}")
+            target = variant_model_path(session_class, model_name, variant)
+            if target.exists() and not args.force:
+                print({"model": model_name, "variant": variant, "path": str(target), "status": "exists"})
+                continue
+            target.parent.mkdir(parents=True, exist_ok=True)
+            BUILDERS[variant](source, target)
+            print(
+                {
+                    "model": model_name,
+                    "variant": variant,
+                    "path": str(target),
+                    "fp32_mb": round(source.stat().st_size / (1024 * 1024), 1),
+                    "variant_mb": round(target.stat().st_size / (1024 * 1024), 1),
+                }
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def synthetic_images(count: int, size: int) -> list[bytes]:
+    images = []
+    for index in range(count):
+        img = Image.new('RGB', (size, size), (235, 235, 235))
+        draw = ImageDraw.Draw(img)
+        inset = size // 6 + index * 7
+        draw.ellipse((inset, inset, size - inset, size - inset // 2), fill=(30 + index * 20, 120, 60))
+        draw.rectangle((size // 3, size // 2, size // 2, size - 10), fill=(120, 40, 40))
+        out = io.BytesIO()
+        img.save(out, format='PNG')
+        images.append(out.getvalue())
+    return images
+
+
+def load_images(directory: str | None, count: int, size: int) -> list[bytes]:
+    if not directory:
+        return synthetic_images(count, size)
+    paths = sorted(p for p in Path(directory).iterdir() if p.suffix.lower() in {'.png', '.jpg', '.jpeg', '.webp'})
+    return [p.read_bytes() for p in paths[:count]]
+
+
+def run_variant(model: str, variant: str, images: list[bytes], runs: int) -> dict:
+    # Spawned child: settings are read from the environment on first import.
+    os.environ['REMBG_MODEL_VARIANT'] = variant
+    from rembg import remove
+    from rembg.sessions import sessions_class
+
+    from app.infrastructure.process_stats import process_rss_mb
+    from app.infrastructure.rembg_background_remover import create_session, variant_model_path
+
+    if variant != 'fp32':
+        # create_session() falls back to fp32 when the file is missing, which would be measured as the variant.
+        session_class = next((c for c in sessions_class if c.name() == model), None)
+        model_path = variant_model_path(session_class, model, variant) if session_class else None
+        if model_path is None or not model_path.is_file():
+            return {'variant': variant, 'skipped': f'no {variant} model file at {model_path}'}
+
+    rss_before = process_rss_mb()
+    started = time.perf_counter()
+    session = create_session(model)
+    load_sec = time.perf_counter() - started
+    session_mb = process_rss_mb() - rss_before
+
+    masks: list[bytes] = []
+    latencies: list[float] = []
+    for image_bytes in images:
+        image = Image.open(io.BytesIO(image_bytes))
+        remove(image, session=session, only_mask=True)
+        for _ in range(runs):
+            started = time.perf_counter()
+            mask = remove(image, session=session, only_mask=True)
+            latencies.append(time.perf_counter() - started)
+        masks.append(mask.convert('L').tobytes())
+
+    latencies.sort()
+    return {
+        'variant': variant,
+        'load_sec': round(load_sec, 3),
+        'session_rss_mb': round(session_mb, 1),
+        'peak_rss_mb': round(process_rss_mb(), 1),
+        'latency_p50_ms': round(statistics.median(latencies) * 1000, 1),
+        'latency_p95_ms': round(latencies[int(0.95 * (len(latencies) - 1))] * 1000, 1),
+        'masks': masks,
+    }
+
+
+def mask_quality(reference: list[bytes], candidate: list[bytes]) -> dict[str, float]:
+    ious = []
+    maes = []
+    for ref_bytes, cand_bytes in zip(reference, candidate):
+        ref = np.frombuffer(ref_bytes, dtype=np.uint8).astype(np.float32) / 255.0
+        cand = np.frombuffer(cand_bytes, dtype=np.uint8).astype(np.float32) / 255.0
+        ref_fg = ref >= 0.5
+        cand_fg = cand >= 0.5
+        union = np.logical_or(ref_fg, cand_fg).sum()
+        ious.append(1.0 if union == 0 else float(np.logical_and(ref_fg, cand_fg).sum() / union))
+        maes.append(float(np.abs(ref - cand).mean()))
+    return {
+        'iou_mean': round(statistics.mean(ious), 4),
+        'iou_min': round(min(ious), 4),
+        'mae_mean': round(statistics.mean(maes), 4),
+        'mae_max': round(max(maes), 4),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare model variants against FP32 masks.')
+    parser.add_argument('--model', default='u2net')
+    parser.add_argument('--variants', default='int8,optimized')
+    parser.add_argument('--images', help='directory of sample images (synthetic set when omitted)')
+    parser.add_argument('--count', type=int, default=6)
+    parser.add_argument('--size', type=int, default=768)
+    parser.add_argument('--runs', type=int, default=3, help='timed runs per image')
+    parser.add_argument('--min-iou', type=float, default=0.97, help='exit non-zero below this mean IoU')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    images = load_images(args.images, args.count, args.size)
+    variants = ['fp32'] + [x.strip() for x in args.variants.split(',') if x.strip() and x.strip() != 'fp32']
+
+    # One fresh process per variant keeps the memory numbers independent of each other.
+    context = multiprocessing.get_context('spawn')
+    results = []
+    for variant in variants:
+        with context.Pool(1) as pool:
+            results.append(pool.apply(run_variant, (args.model, variant, images, args.runs)))
+
+    reference = results[0]['masks']
+    report = []
+    for result in results:
+        if 'skipped' not in result:
+            result.update(mask_quality(reference, result.pop('masks')))
+        report.append(result)
+        print(result)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({'model': args.model, 'images': len(images), 'results': report}, indent=2))
+
+    skipped = [r['variant'] for r in report if 'skipped' in r]
+    failing = [r['variant'] for r in report if 'skipped' not in r and r['iou_mean'] < args.min_iou]
+    if failing:
+        raise SystemExit(f'mask IoU below {args.min_iou} for: {", ".join(failing)}')
+    if skipped:
+        raise SystemExit(f'variants not built (run scripts/build_model_variants.py): {", ".join(skipped)}')
+
+
+if __name__ == '__main__':
+    main()
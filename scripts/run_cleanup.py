@@ -5,5 +5,5 @@ from app.tasks.maintenance_jobs import cleanup_expired_outputs_job
 
 
 if __name__ == "__main__":
-    result = cleanup_expired_outputs_job(settings.cleanup_older_than_seconds)
+    result = cleanup_expired_outputs_job(settings.cleanup_older_than_seconds, reconcile=True)
     print(result)
@@ -458,6 +458,7 @@ async function submitSingleJob(file) {
   formData.append('file', file);
   formData.append('feather_radius', featherInput.value);
   formData.append('alpha_boost', alphaBoostInput.value);
+  formData.append('preview', 'true');
 
   const response = await fetch('/api/jobs/remove-bg', {
     method: 'POST',
@@ -634,16 +635,26 @@ async function processSingleImage() {
 
   try {
     const { job_id: jobId } = await submitSingleJob(state.selectedFile);
+    let previewShown = false;
+    let fullLoaded = false;
     const status = await pollJob(jobId, (jobState) => {
       setStatus(
         `Job: ${jobState.status} (${jobState.stage || 'running'}) ETA ${formatEta(jobState.eta_seconds || 0)}`,
       );
       setSingleProgress(jobState.progress || 0);
+      if (jobState.preview_path && jobState.status !== 'finished' && !previewShown) {
+        previewShown = true;
+        fetch(jobState.preview_path)
+          .then((response) => (response.ok ? response.blob() : null))
+          .then((blob) => blob && !fullLoaded && loadProcessedImage(blob))
+          .catch(() => {});
+      }
     });
     if (!status.download_path) {
       throw new Error('Result is missing download path');
     }
     const blob = await downloadJobBlob(jobId);
+    fullLoaded = true;
     await loadProcessedImage(blob);
     setSingleProgress(100);
     setStatus('Done');
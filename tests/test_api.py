@@ -3,9 +3,12 @@ from __future__ import annotations
 import io
 from types import SimpleNamespace
 
+from botocore.exceptions import ClientError
 from fastapi.testclient import TestClient
 from PIL import Image
+from rq.exceptions import NoSuchJobError
 
+from app.application.remove_background_use_case import RemoveBackgroundResult
 from app.presentation import api
 
 
@@ -49,6 +52,118 @@ def test_enqueue_single_job(monkeypatch) -> None:
     assert fake.calls
 
 
+def test_enqueue_single_job_reuses_inflight_job(monkeypatch) -> None:
+    class FakeInFlight:
+        def claim(self, fingerprint, job_id):  # noqa: ARG002
+            return 'job-existing'
+
+    class DummyJob:
+        def get_status(self, refresh=True):  # noqa: ARG002
+            return 'queued'
+
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+    monkeypatch.setattr(api, 'inflight', FakeInFlight())
+    monkeypatch.setattr(api.Job, 'fetch', lambda *args, **kwargs: DummyJob())  # noqa: ARG005
+
+    client = TestClient(api.app)
+    res = client.post(
+        '/api/jobs/remove-bg',
+        files={'file': ('a.png', _image_bytes(), 'image/png')},
+        data={'feather_radius': '0', 'alpha_boost': '1'},
+    )
+
+    assert res.status_code == 200
+    assert res.json() == {'job_id': 'job-existing', 'status': 'queued', 'deduplicated': True}
+    assert not fake.calls
+
+
+def test_claim_without_a_job_yet_counts_as_in_flight(monkeypatch) -> None:
+    class FakeInFlight:
+        takeovers = []
+
+        def claim(self, fingerprint, job_id):  # noqa: ARG002
+            return 'job-claiming'
+
+        def takeover(self, fingerprint, stale_job_id, job_id, min_age_seconds=0):  # noqa: ARG002
+            self.takeovers.append(min_age_seconds)
+            return stale_job_id
+
+    def missing(*args, **kwargs):  # noqa: ARG001
+        raise NoSuchJobError('not enqueued yet')
+
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+    monkeypatch.setattr(api, 'inflight', FakeInFlight())
+    monkeypatch.setattr(api.Job, 'fetch', missing)
+
+    client = TestClient(api.app)
+    res = client.post('/api/jobs/remove-bg', files={'file': ('a.png', _image_bytes(), 'image/png')})
+
+    assert res.json() == {'job_id': 'job-claiming', 'status': 'queued', 'deduplicated': True}
+    assert FakeInFlight.takeovers == [api.settings.dedup_claim_grace_seconds]
+    assert not fake.calls
+
+
+def test_finished_owner_is_taken_over_instead_of_reused(monkeypatch) -> None:
+    class FakeInFlight:
+        def claim(self, fingerprint, job_id):  # noqa: ARG002
+            return 'job-done'
+
+        def takeover(self, fingerprint, stale_job_id, job_id, min_age_seconds=0):  # noqa: ARG002
+            assert min_age_seconds == 0
+            return job_id
+
+    class DummyJob:
+        def get_status(self, refresh=True):  # noqa: ARG002
+            return 'finished'
+
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+    monkeypatch.setattr(api, 'inflight', FakeInFlight())
+    monkeypatch.setattr(api.Job, 'fetch', lambda *args, **kwargs: DummyJob())  # noqa: ARG005
+
+    client = TestClient(api.app)
+    res = client.post('/api/jobs/remove-bg', files={'file': ('a.png', _image_bytes(), 'image/png')})
+
+    assert res.json()['deduplicated'] is False
+    assert len(fake.calls) == 1
+
+
+def test_sync_remove_bg_returns_png(monkeypatch) -> None:
+    class FakeUseCase:
+        def execute(self, image_bytes, options):  # noqa: ARG002
+            return RemoveBackgroundResult(b'png-bytes', 'image/png', 'png')
+
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+    monkeypatch.setattr(api, 'sync_use_case', FakeUseCase())
+
+    client = TestClient(api.app)
+    res = client.post('/api/remove-bg', files={'file': ('a.png', _image_bytes(), 'image/png')})
+
+    assert res.status_code == 200
+    assert res.content == b'png-bytes'
+    assert res.headers['x-rmbg-path'] == 'sync'
+    assert not fake.calls
+    assert ('sync_latency_seconds', '') in api.metrics._histogram_snapshot()
+
+
+def test_sync_remove_bg_falls_back_to_queue_for_large_images(monkeypatch) -> None:
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+    monkeypatch.setattr(api.settings, 'sync_max_pixels', 100)
+    monkeypatch.setattr(api.settings, 'dedup_enabled', False)
+
+    client = TestClient(api.app)
+    res = client.post('/api/remove-bg', files={'file': ('a.png', _image_bytes(), 'image/png')})
+
+    assert res.status_code == 202
+    assert res.json()['job_id'] == 'job-123'
+    assert res.json()['fallback'] == 'too_large'
+    assert fake.calls
+
+
 def test_enqueue_rejects_non_image(monkeypatch) -> None:
     fake = FakeQueue()
     monkeypatch.setattr(api, 'queue', fake)
@@ -62,6 +177,36 @@ def test_enqueue_rejects_non_image(monkeypatch) -> None:
     assert res.status_code == 400
 
 
+def test_enqueue_rejects_unknown_model(monkeypatch) -> None:
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+
+    client = TestClient(api.app)
+    res = client.post(
+        '/api/jobs/remove-bg',
+        files={'file': ('a.png', _image_bytes(), 'image/png')},
+        data={'model': 'not-a-model'},
+    )
+
+    assert res.status_code == 400
+    assert not fake.calls
+
+
+def test_enqueue_rejects_unknown_output_format(monkeypatch) -> None:
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+
+    client = TestClient(api.app)
+    res = client.post(
+        '/api/jobs/remove-bg',
+        files={'file': ('a.png', _image_bytes(), 'image/png')},
+        data={'output_format': 'tiff'},
+    )
+
+    assert res.status_code == 400
+    assert not fake.calls
+
+
 def test_metrics_endpoint() -> None:
     client = TestClient(api.app)
     res = client.get('/api/metrics')
@@ -89,6 +234,132 @@ def test_cancel_job(monkeypatch) -> None:
     assert res.json()['status'] == 'canceled'
 
 
+def test_refine_job_runs_sync_from_cached_cutout(monkeypatch) -> None:
+    class DummyJob:
+        id = 'job-x'
+        result = {'filename': 'a.png', 'source_key': 'jobs/single/job-x/_source/cutout.png'}
+
+        def get_status(self, refresh=True):  # noqa: ARG002
+            return 'finished'
+
+    class DummyStorage:
+        def get_bytes(self, key):
+            assert key == DummyJob.result['source_key']
+            return _image_bytes()
+
+    fake = FakeQueue()
+    monkeypatch.setattr(api, 'queue', fake)
+    monkeypatch.setattr(api, 'storage', DummyStorage())
+    monkeypatch.setattr(api.Job, 'fetch', lambda *args, **kwargs: DummyJob())  # noqa: ARG005
+
+    client = TestClient(api.app)
+    res = client.post('/api/jobs/job-x/refine', data={'feather_radius': '1', 'sync': 'true'})
+
+    assert res.status_code == 200
+    assert res.headers['content-type'] == 'image/png'
+    assert not fake.calls
+
+
+def test_sync_refine_maps_only_a_missing_cache_to_410(monkeypatch) -> None:
+    class DummyJob:
+        id = 'job-x'
+        result = {'filename': 'a.png', 'source_key': 'jobs/single/job-x/_source/cutout.png'}
+
+        def get_status(self, refresh=True):  # noqa: ARG002
+            return 'finished'
+
+    class FailingStorage:
+        error: Exception = RuntimeError('S3 unavailable')
+
+        def get_bytes(self, key):  # noqa: ARG002
+            raise self.error
+
+    monkeypatch.setattr(api, 'queue', FakeQueue())
+    monkeypatch.setattr(api, 'storage', FailingStorage())
+    monkeypatch.setattr(api.Job, 'fetch', lambda *args, **kwargs: DummyJob())  # noqa: ARG005
+
+    client = TestClient(api.app, raise_server_exceptions=False)
+    assert client.post('/api/jobs/job-x/refine', data={'sync': 'true'}).status_code == 500
+
+    FailingStorage.error = ClientError({'Error': {'Code': 'NoSuchKey'}}, 'GetObject')
+    assert client.post('/api/jobs/job-x/refine', data={'sync': 'true'}).status_code == 410
+
+
+def test_download_job_result_reads_finished_job_from_storage(monkeypatch) -> None:
+    class DummyJob:
+        status = 'started'
+        result = {'key': 'jobs/single/job-x/a.png', 'filename': 'a.png', 'content_type': 'image/png'}
+
+        def get_status(self, refresh=True):  # noqa: ARG002
+            return self.status
+
+    class DummyStorage:
+        def get_bytes(self, key):
+            assert key == DummyJob.result['key']
+            return b'png-bytes'
+
+    monkeypatch.setattr(api, 'storage', DummyStorage())
+    monkeypatch.setattr(api.Job, 'fetch', lambda *args, **kwargs: DummyJob())  # noqa: ARG005
+
+    client = TestClient(api.app)
+    assert client.get('/api/jobs/job-x/download').status_code == 409
+
+    DummyJob.status = 'finished'
+    res = client.get('/api/jobs/job-x/download')
+
+    assert res.status_code == 200
+    assert res.content == b'png-bytes'
+    assert res.headers['content-disposition'] == 'attachment; filename="a.png"'
+
+
+def test_warm_up_loads_the_sync_model_with_its_own_thread_share(monkeypatch) -> None:
+    from app.infrastructure import rembg_background_remover
+
+    class FakeRemover:
+        instances = []
+
+        def __init__(self, default_model=None, intra_op_threads=0) -> None:  # noqa: ARG002
+            self.intra_op_threads = intra_op_threads
+            self.warmed = False
+            self.instances.append(self)
+
+        def warm(self, model_name=None) -> None:  # noqa: ARG002
+            self.warmed = True
+
+    monkeypatch.setattr(rembg_background_remover, 'RembgBackgroundRemover', FakeRemover)
+    monkeypatch.setattr(api, 'sync_use_case', None)
+    monkeypatch.setattr(api, 'available_cpus', lambda: 16)
+    monkeypatch.setattr(api.settings, 'sync_onnx_threads', 0)
+    monkeypatch.setattr(api.settings, 'api_processes', 2)
+    monkeypatch.setattr(api.settings, 'sync_pool_workers', 2)
+    monkeypatch.setattr(api.settings, 'animation_reuse_threshold', 3.0)
+    monkeypatch.setattr(api, 'readiness', {'redis': True, 'storage': True})
+
+    api._warm_up()
+
+    (remover,) = FakeRemover.instances
+    assert remover.warmed
+    assert remover.intra_op_threads == 4
+    assert api.sync_use_case._frame_reuse_threshold == 3.0
+
+
+def test_ready_reports_unready_dependencies(monkeypatch) -> None:
+    class PingingRedis:
+        def ping(self):
+            return True
+
+    monkeypatch.setattr(api, 'redis_connection', PingingRedis())
+    monkeypatch.setitem(api.readiness, 'storage', False)
+    client = TestClient(api.app)
+
+    res = client.get('/api/ready')
+    assert res.status_code == 503
+    assert res.json()['checks'] == {'redis': True, 'storage': False}
+
+    monkeypatch.setitem(api.readiness, 'storage', True)
+    assert client.get('/api/ready').status_code == 200
+
+
 def test_prometheus_metrics() -> None:
     client = TestClient(api.app)
     res = client.get('/api/metrics/prometheus')
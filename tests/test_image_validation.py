@@ -5,7 +5,7 @@ import io
 from PIL import Image
 import pytest
 
-from app.infrastructure.image_validation import ImageValidationError, validate_image_bytes
+from app.infrastructure.image_validation import ImageValidationError, count_frames, validate_image_bytes
 
 
 def _png_bytes(width: int = 32, height: int = 32) -> bytes:
@@ -30,3 +30,25 @@ def test_validate_image_bytes_rejects_invalid() -> None:
 def test_validate_image_bytes_rejects_large_pixels() -> None:
     with pytest.raises(ImageValidationError):
         validate_image_bytes(_png_bytes(200, 200), max_pixels=10_000)
+
+
+def test_validate_image_bytes_counts_every_animation_frame() -> None:
+    frames = [Image.new('RGB', (50, 50), (index * 40, 0, 0)) for index in range(4)]
+    out = io.BytesIO()
+    frames[0].save(out, format='GIF', save_all=True, append_images=frames[1:])
+
+    with pytest.raises(ImageValidationError):
+        validate_image_bytes(out.getvalue(), max_pixels=9_000)
+    with pytest.raises(ImageValidationError):
+        validate_image_bytes(out.getvalue(), max_pixels=100_000, max_frames=3)
+    assert validate_image_bytes(out.getvalue(), max_pixels=100_000, max_frames=4)[2] == 'GIF'
+
+
+def test_multi_frame_stills_count_only_their_first_frame() -> None:
+    pages = [Image.new('RGB', (50, 50), (index * 40, 0, 0)) for index in range(4)]
+    for fmt in ('TIFF', 'MPO'):
+        out = io.BytesIO()
+        pages[0].save(out, format=fmt, save_all=True, append_images=pages[1:])
+
+        assert count_frames(out.getvalue()) == 1
+        assert validate_image_bytes(out.getvalue(), max_pixels=2_500, max_frames=1)[:2] == (50, 50)
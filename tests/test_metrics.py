@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.infrastructure.metrics import MetricsStore
+
+
+class FakeRedis:
+    """Just the hash/set commands MetricsStore uses, with pipelines executed immediately."""
+
+    def __init__(self) -> None:
+        self.hashes: dict[str, dict[str, float]] = defaultdict(dict)
+        self.sets: dict[str, set[str]] = defaultdict(set)
+        self._results: list = []
+
+    def pipeline(self, transaction=True):  # noqa: ARG002
+        self._results = []
+        return self
+
+    def execute(self):
+        results, self._results = self._results, []
+        return results
+
+    def hincrby(self, key, field, amount):
+        self.hashes[key][field] = self.hashes[key].get(field, 0) + amount
+
+    hincrbyfloat = hincrby
+
+    def sadd(self, key, member):
+        self.sets[key].add(member)
+
+    def smembers(self, key):
+        return set(self.sets[key])
+
+    def hgetall(self, key):
+        fields = {field: str(value) for field, value in self.hashes[key].items()}
+        self._results.append(fields)
+        return fields
+
+
+class DownRedis:
+    def pipeline(self, transaction=True):  # noqa: ARG002
+        raise RedisConnectionError("down")
+
+    def hgetall(self, key):
+        raise RedisConnectionError("down")
+
+
+def test_stage_histograms_aggregate_across_processes() -> None:
+    shared = FakeRedis()
+    api_process, worker_process = MetricsStore(), MetricsStore()
+    for store in (api_process, worker_process):
+        store.attach(shared, flush_interval=3600)
+
+    api_process.observe_histogram("stage_seconds", 0.003, {"stage": "validate"})
+    api_process.incr("jobs_submitted_total")
+    worker_process.observe_histogram("stage_seconds", 0.3, {"stage": "inference"})
+    worker_process.observe_histogram("stage_seconds", 7.0, {"stage": "inference"})
+    worker_process.incr("jobs_submitted_total")
+    worker_process.flush()
+
+    text = api_process.to_prometheus_text()
+
+    assert "rmbg_jobs_submitted_total 2" in text
+    assert "# TYPE rmbg_stage_seconds histogram" in text
+    assert 'rmbg_stage_seconds_bucket{stage="validate",le="0.005"} 1' in text
+    assert 'rmbg_stage_seconds_bucket{stage="inference",le="0.25"} 0' in text
+    assert 'rmbg_stage_seconds_bucket{stage="inference",le="0.5"} 1' in text
+    assert 'rmbg_stage_seconds_bucket{stage="inference",le="+Inf"} 2' in text
+    assert 'rmbg_stage_seconds_count{stage="inference"} 2' in text
+    assert 'rmbg_stage_seconds_sum{stage="inference"} 7.3' in text
+
+
+def test_unreachable_redis_keeps_deltas_and_reports_local_values() -> None:
+    store = MetricsStore()
+    store.attach(DownRedis(), flush_interval=3600)
+    with store.stage_timer("encode"):
+        pass
+    store.incr("downloads_total")
+
+    text = store.to_prometheus_text()
+
+    assert "rmbg_downloads_total 1" in text
+    assert 'rmbg_stage_seconds_count{stage="encode"} 1' in text
+    assert store.snapshot()["stage_seconds_encode_count"] == 1
+    assert store._pending_counters["downloads_total"] == 1
+
+
+def test_snapshot_reports_fleet_counters_and_histogram_quantiles() -> None:
+    shared = FakeRedis()
+    api_process, worker_process = MetricsStore(), MetricsStore()
+    for store in (api_process, worker_process):
+        store.attach(shared, flush_interval=3600)
+
+    worker_process.incr("jobs_completed_total", 3)
+    for value in (0.2, 0.2, 0.2, 0.2, 4.0):
+        worker_process.observe_histogram("queue_latency_seconds", value)
+    worker_process.flush()
+
+    snapshot = api_process.snapshot()
+
+    assert snapshot["jobs_completed_total"] == 3
+    assert snapshot["queue_latency_seconds_count"] == 5
+    # p50 interpolates inside the (0.1, 0.25] bucket, p99 inside (2.5, 5.0].
+    assert 0.1 < snapshot["queue_latency_seconds_p50"] <= 0.25
+    assert 2.5 < snapshot["queue_latency_seconds_p99"] <= 5.0
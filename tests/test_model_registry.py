@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from app.infrastructure import model_registry
+from app.infrastructure.model_registry import ModelSessionRegistry
+
+
+def test_registry_loads_lazily_and_evicts_least_recently_used(monkeypatch) -> None:
+    rss = {'value': 100.0}
+    loads = []
+
+    def factory(name: str) -> str:
+        loads.append(name)
+        rss['value'] += 200.0
+        return f'session-{name}'
+
+    monkeypatch.setattr(model_registry, 'process_rss_mb', lambda: rss['value'])
+    registry = ModelSessionRegistry(factory, budget_mb=450)
+
+    assert loads == []
+    assert registry.get('u2net') == 'session-u2net'
+    assert registry.get('u2netp') == 'session-u2netp'
+    assert registry.get('u2net') == 'session-u2net'
+    assert loads == ['u2net', 'u2netp']
+
+    registry.get('isnet-general-use')
+
+    assert registry.loaded_models() == ['u2net', 'isnet-general-use']
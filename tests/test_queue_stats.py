@@ -0,0 +1,61 @@
+import time
+
+from app.infrastructure.queue_stats import LaneStats, read_queue_stats
+
+
+class FakeRedis:
+    """Lists, sorted sets and plain keys; pipelines run commands as they are queued."""
+
+    def __init__(self) -> None:
+        self.lists: dict[str, list[str]] = {}
+        self.zsets: dict[str, dict[str, float]] = {}
+        self.values: dict[str, bytes] = {}
+        self.round_trips = 0
+        self._results: list = []
+
+    def pipeline(self, transaction=True):  # noqa: ARG002
+        self._results = []
+        return self
+
+    def execute(self):
+        self.round_trips += 1
+        results, self._results = self._results, []
+        return results
+
+    def llen(self, key):
+        self._results.append(len(self.lists.get(key, [])))
+
+    def zcount(self, key, low, high):  # noqa: ARG002
+        self._results.append(sum(1 for score in self.zsets.get(key, {}).values() if score >= low))
+
+    def get(self, key):
+        self.round_trips += 1
+        return self.values.get(key)
+
+    def set(self, key, value, px=None):  # noqa: ARG002
+        self.values[key] = value.encode()
+
+
+def test_counts_every_lane_in_one_round_trip_and_skips_expired_entries() -> None:
+    redis = FakeRedis()
+    now = time.time()
+    redis.lists['rq:queue:rmbg'] = ['a', 'b']
+    redis.lists['rq:queue:rmbg-u2netp'] = ['c']
+    redis.zsets['rq:wip:rmbg'] = {'d': now + 600, 'stale': now - 60}
+    redis.zsets['rq:failed:rmbg-u2netp'] = {'e': now + 86400}
+
+    stats = read_queue_stats(redis, ['rmbg', 'rmbg-u2netp'])
+
+    assert stats == {'rmbg': LaneStats(2, 1, 0), 'rmbg-u2netp': LaneStats(1, 0, 1)}
+    assert redis.round_trips == 1
+
+
+def test_cached_stats_are_reused_within_the_window() -> None:
+    redis = FakeRedis()
+    redis.lists['rq:queue:rmbg'] = ['a']
+
+    first = read_queue_stats(redis, ['rmbg'], cache_seconds=5)
+    redis.lists['rq:queue:rmbg'].append('b')
+    second = read_queue_stats(redis, ['rmbg'], cache_seconds=5)
+
+    assert first == second == {'rmbg': LaneStats(1, 0, 0)}
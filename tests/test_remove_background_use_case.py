@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.application.remove_background_use_case import RemoveBackgroundOptions, RemoveBackgroundUseCase
+from app.domain.background_remover import BackgroundRemover
+
+
+class EllipseRemover(BackgroundRemover):
+    def remove(self, image_bytes: bytes, model_name: str | None = None) -> bytes:  # noqa: ARG002
+        raise AssertionError('large images must not go through remove()')
+
+    def predict_mask(self, image: Image.Image, model_name: str | None = None) -> Image.Image:  # noqa: ARG002
+        mask = Image.new('L', image.size, 0)
+        box = (image.width // 4, image.height // 4, image.width * 3 // 4, image.height * 3 // 4)
+        ImageDraw.Draw(mask).ellipse(box, fill=255)
+        return mask
+
+
+class CutoutRemover(EllipseRemover):
+    def remove(self, image_bytes: bytes, model_name: str | None = None) -> bytes:  # noqa: ARG002
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            cutout = image.convert('RGBA')
+        cutout.putalpha(self.predict_mask(cutout))
+        out = io.BytesIO()
+        cutout.save(out, format='PNG')
+        return out.getvalue()
+
+
+def _photo(width: int, height: int) -> bytes:
+    out = io.BytesIO()
+    Image.effect_noise((width, height), 40).convert('RGB').save(out, format='PNG')
+    return out.getvalue()
+
+
+def _decode(data: bytes) -> np.ndarray:
+    with Image.open(io.BytesIO(data)) as image:
+        return np.asarray(image).astype(int)
+
+
+def test_tiled_path_matches_single_strip_output() -> None:
+    image_bytes = _photo(120, 90)
+    options = RemoveBackgroundOptions(feather_radius=2.0, alpha_boost=1.4)
+
+    tiled = RemoveBackgroundUseCase(EllipseRemover(), large_image_pixels=1, strip_rows=7)
+    whole = RemoveBackgroundUseCase(EllipseRemover(), large_image_pixels=1, strip_rows=1000)
+    tiled_result = tiled.execute(image_bytes, options)
+    whole_result = whole.execute(image_bytes, options)
+
+    assert tiled_result.content_type == 'image/png'
+    assert _decode(tiled_result.data).shape == (90, 120, 4)
+    # Strip boundaries only shift resampling rounding, never by more than a couple of levels.
+    assert np.abs(_decode(tiled_result.data) - _decode(whole_result.data)).max() <= 2
+
+
+def test_tiled_path_crops_and_streams_mask() -> None:
+    options = RemoveBackgroundOptions(output_format='mask', crop_to_content=True)
+
+    use_case = RemoveBackgroundUseCase(EllipseRemover(), large_image_pixels=1, strip_rows=16)
+    result = use_case.execute(_photo(200, 100), options)
+
+    left, top, right, bottom = result.crop_box
+    assert left <= 50 and top <= 25 and right >= 150 and bottom >= 75
+    mask = _decode(result.data)
+    assert mask.shape == (bottom - top, right - left)
+    assert mask[mask.shape[0] // 2, mask.shape[1] // 2] == 255
+
+
+def test_animated_input_reuses_masks_for_static_frames() -> None:
+    class CountingRemover(EllipseRemover):
+        def __init__(self) -> None:
+            self.frames = 0
+
+        def predict_mask(self, image: Image.Image, model_name: str | None = None) -> Image.Image:
+            self.frames += 1
+            return super().predict_mask(image, model_name)
+
+    frames = []
+    for index, offset in enumerate((0, 0, 0, 20, 20)):
+        frame = Image.new('RGB', (60, 40), 'white')
+        ImageDraw.Draw(frame).rectangle((offset, 10, offset + 20, 30), fill='red')
+        frame.putpixel((59, index), (0, 0, 0))  # near-identical, so the GIF encoder keeps every frame
+        frames.append(frame)
+    out = io.BytesIO()
+    frames[0].save(out, format='GIF', save_all=True, append_images=frames[1:], duration=80, loop=0)
+    remover = CountingRemover()
+
+    result = RemoveBackgroundUseCase(remover, frame_reuse_threshold=1.0).execute(out.getvalue())
+
+    assert (result.frames, result.frames_inferred, remover.frames) == (5, 2, 2)
+    with Image.open(io.BytesIO(result.data)) as animation:
+        assert animation.format == 'PNG'
+        assert animation.n_frames == 5
+        assert animation.convert('RGBA').getpixel((0, 0))[3] == 0
+
+
+def test_multi_frame_still_is_not_treated_as_animation() -> None:
+    views = [Image.new('RGB', (40, 30), color) for color in ('white', 'gray')]
+    out = io.BytesIO()
+    views[0].save(out, format='MPO', save_all=True, append_images=views[1:])
+
+    result = RemoveBackgroundUseCase(CutoutRemover()).execute(out.getvalue())
+
+    assert result.frames == 1
+    with Image.open(io.BytesIO(result.data)) as image:
+        assert not getattr(image, 'is_animated', False)
+        assert image.size == (40, 30)
+
+
+def test_progressive_final_result_matches_a_job_without_preview() -> None:
+    use_case = RemoveBackgroundUseCase(CutoutRemover())
+    image_bytes = _photo(120, 90)
+    options = RemoveBackgroundOptions(feather_radius=1.5)
+    previews = []
+
+    result = use_case.execute_progressive(image_bytes, options, 32, previews.append)
+
+    assert len(previews) == 1
+    with Image.open(io.BytesIO(previews[0].data)) as preview:
+        assert max(preview.size) == 32
+    assert result.data == use_case.execute(image_bytes, options).data
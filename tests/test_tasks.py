@@ -1,20 +1,38 @@
 from __future__ import annotations
 
 import io
+import json
 import sys
 import types
+from datetime import datetime, timezone
 
 from PIL import Image
 
 # Stub rembg for test environment without onnx model packages.
 if 'rembg' not in sys.modules:
+
+    class StubSession:
+        def __init__(self, model_name, sess_opts, *args, **kwargs) -> None:  # noqa: ARG002
+            self.model_name = model_name
+
+        @classmethod
+        def name(cls) -> str:
+            return 'u2net'
+
+        def predict(self, img, *args, **kwargs):  # noqa: ARG002
+            if 'A' in img.getbands():
+                return [img.getchannel('A')]
+            return [Image.new('L', img.size, 255)]
+
     rembg_stub = types.SimpleNamespace(
-        new_session=lambda: object(),
-        remove=lambda image_bytes, session=None: image_bytes,
+        new_session=lambda *args, **kwargs: object(),  # noqa: ARG005
+        remove=lambda image_bytes, session=None, **kwargs: image_bytes,  # noqa: ARG005
     )
     sys.modules['rembg'] = rembg_stub
+    sys.modules['rembg.sessions'] = types.SimpleNamespace(sessions_class=[StubSession])
 
-from app.tasks import background_jobs
+from app.infrastructure.metrics import MetricsStore
+from app.tasks import background_jobs, maintenance_jobs
 
 
 class StubStorage:
@@ -24,6 +42,39 @@ class StubStorage:
     def put_bytes(self, key: str, data: bytes, content_type: str) -> None:
         self.objects[key] = (data, content_type)
 
+    def get_bytes(self, key: str) -> bytes:
+        return self.objects[key][0]
+
+    def delete_objects(self, keys: list[str]) -> list[str]:
+        for key in keys:
+            self.objects.pop(key, None)
+        return []
+
+
+class StubExpiryIndex:
+    def __init__(self) -> None:
+        self.entries = {}
+
+    def register(self, object_key: str, expires_at: float, size: int = 0) -> None:
+        self.entries[object_key] = (expires_at, size)
+
+    def register_many(self, objects: list[tuple[str, int]], expires_at: float) -> None:
+        for key, size in objects:
+            self.register(key, expires_at, size)
+
+    def pop_expired(self, now: float, limit: int = 1000) -> list[tuple[str, int]]:
+        expired = [(key, size) for key, (expires_at, size) in self.entries.items() if expires_at <= now][:limit]
+        for key, _ in expired:
+            del self.entries[key]
+        return expired
+
+    def forget(self, object_keys: list[str]) -> None:
+        for key in object_keys:
+            self.entries.pop(key, None)
+
+    def expires_at(self, object_keys: list[str]) -> list[float | None]:
+        return [self.entries[key][0] if key in self.entries else None for key in object_keys]
+
 
 def _image_bytes() -> bytes:
     image = Image.new('RGBA', (20, 20), (255, 0, 0, 255))
@@ -34,9 +85,231 @@ def _image_bytes() -> bytes:
 
 def test_process_single_image_job(monkeypatch) -> None:
     storage = StubStorage()
+    index = StubExpiryIndex()
     monkeypatch.setattr(background_jobs, 'storage', storage)
+    monkeypatch.setattr(background_jobs, 'expiry_index', index)
 
     result = background_jobs.process_single_image_job(_image_bytes(), 'sample.png', 0.0, 1.0)
 
     assert result['content_type'] == 'image/png'
     assert result['key'] in storage.objects
+    assert result['key'] in index.entries
+
+
+def test_process_single_image_job_stores_profile_when_requested(monkeypatch) -> None:
+    storage = StubStorage()
+    monkeypatch.setattr(background_jobs, 'storage', storage)
+    monkeypatch.setattr(background_jobs, 'expiry_index', StubExpiryIndex())
+
+    background_jobs.process_single_image_job(_image_bytes(), 'sample.png', 0.0, 1.0, profile=True)
+
+    data, content_type = storage.objects['jobs/single/sync/_profile/profile.json']
+    profile = json.loads(data)
+    assert content_type == 'application/json'
+    assert profile['wall_seconds'] > 0
+    assert profile['tracemalloc_peak_mb'] >= 0
+    assert set(profile) >= {'samples', 'top_self', 'stacks'}
+
+
+def test_process_single_image_job_encodes_webp(monkeypatch) -> None:
+    storage = StubStorage()
+    monkeypatch.setattr(background_jobs, 'storage', storage)
+    monkeypatch.setattr(background_jobs, 'expiry_index', StubExpiryIndex())
+
+    result = background_jobs.process_single_image_job(
+        _image_bytes(), 'sample.png', 0.0, 1.0, None, {'output_format': 'webp'}
+    )
+
+    assert result['content_type'] == 'image/webp'
+    assert result['key'].endswith('.webp')
+    data, _ = storage.objects[result['key']]
+    assert data[8:12] == b'WEBP'
+
+
+def test_process_single_image_job_crops_to_content(monkeypatch) -> None:
+    storage = StubStorage()
+    monkeypatch.setattr(background_jobs, 'storage', storage)
+    monkeypatch.setattr(background_jobs, 'expiry_index', StubExpiryIndex())
+    image = Image.new('RGBA', (40, 30), (0, 0, 0, 0))
+    image.paste((255, 0, 0, 255), (10, 5, 20, 15))
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+
+    result = background_jobs.process_single_image_job(
+        out.getvalue(), 'sample.png', 0.0, 1.0, None, {'crop_to_content': True, 'crop_padding': 2}
+    )
+
+    assert result['crop_box'] == [8, 3, 22, 17]
+    data, _ = storage.objects[result['key']]
+    with Image.open(io.BytesIO(data)) as cropped:
+        assert cropped.size == (14, 14)
+
+
+def test_refine_cached_job_matches_fresh_job(monkeypatch) -> None:
+    storage = StubStorage()
+    monkeypatch.setattr(background_jobs, 'storage', storage)
+    monkeypatch.setattr(background_jobs, 'expiry_index', StubExpiryIndex())
+    image = Image.new('RGBA', (20, 20), (0, 0, 0, 0))
+    image.paste((255, 0, 0, 255), (5, 5, 15, 15))
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+
+    first = background_jobs.process_single_image_job(out.getvalue(), 'first.png', 0.0, 1.0)
+    fresh = background_jobs.process_single_image_job(out.getvalue(), 'sample.png', 2.0, 1.5)
+    # Default options output the unrefined cutout, so the result itself is the cache; no second upload.
+    assert first['source_key'] == first['key']
+    assert fresh['source_key'] == 'jobs/single/sync/_source/cutout.png'
+    # Without an rq job every run writes under jobs/single/sync/; keep the fresh output and clear the slot
+    # so the comparison below reads what refine_cached_job wrote.
+    fresh_data = storage.objects[fresh['key']][0]
+    del storage.objects[fresh['key']]
+    monkeypatch.setattr(background_jobs.remover, 'remove', lambda *args, **kwargs: None)  # noqa: ARG005
+    refined = background_jobs.refine_cached_job(first['source_key'], 'sample.png', 2.0, 1.5)
+
+    assert first['source_key'] in storage.objects
+    assert refined['source_key'] == first['source_key']
+    assert storage.objects[refined['key']][0] == fresh_data
+
+
+def test_process_single_image_job_publishes_preview(monkeypatch) -> None:
+    storage = StubStorage()
+    monkeypatch.setattr(background_jobs, 'storage', storage)
+    monkeypatch.setattr(background_jobs, 'expiry_index', StubExpiryIndex())
+    monkeypatch.setattr(background_jobs.settings, 'preview_max_side', 16)
+    image = Image.new('RGBA', (64, 48), (0, 0, 0, 0))
+    image.paste((255, 0, 0, 255), (16, 8, 48, 40))
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+
+    result = background_jobs.process_single_image_job(out.getvalue(), 'sample.png', 0.0, 1.0, preview=True)
+
+    preview, _ = storage.objects['jobs/single/sync/_preview/preview.png']
+    with Image.open(io.BytesIO(preview)) as small:
+        assert small.size == (16, 12)
+    with Image.open(io.BytesIO(storage.objects[result['key']][0])) as full:
+        assert full.size == (64, 48)
+        assert full.getpixel((32, 24))[3] == 255
+        assert full.getpixel((2, 2))[3] == 0
+
+
+def test_preview_does_not_collide_with_an_upload_named_preview(monkeypatch) -> None:
+    storage = StubStorage()
+    monkeypatch.setattr(background_jobs, 'storage', storage)
+    monkeypatch.setattr(background_jobs, 'expiry_index', StubExpiryIndex())
+    monkeypatch.setattr(background_jobs.settings, 'preview_max_side', 16)
+    image = Image.new('RGBA', (64, 48), (255, 0, 0, 255))
+    out = io.BytesIO()
+    image.save(out, format='PNG')
+
+    result = background_jobs.process_single_image_job(out.getvalue(), 'preview.png', 0.0, 1.0, preview=True)
+
+    assert result['key'] == 'jobs/single/sync/preview.png'
+    with Image.open(io.BytesIO(storage.objects['jobs/single/sync/_preview/preview.png'][0])) as small:
+        assert small.size == (16, 12)
+    with Image.open(io.BytesIO(storage.objects[result['key']][0])) as full:
+        assert full.size == (64, 48)
+
+
+def test_cleanup_deletes_only_indexed_expired_outputs(monkeypatch) -> None:
+    storage = StubStorage()
+    storage.objects = {'jobs/single/a/a.png': (b'a', 'image/png'), 'jobs/single/b/b.png': (b'b', 'image/png')}
+    index = StubExpiryIndex()
+    index.register('jobs/single/a/a.png', 0, size=1)
+    index.register('jobs/single/b/b.png', 4_000_000_000, size=1)
+    monkeypatch.setattr(maintenance_jobs, 'storage', storage)
+    monkeypatch.setattr(maintenance_jobs, 'expiry_index', index)
+
+    result = maintenance_jobs.cleanup_expired_outputs_job(3600)
+
+    assert result['deleted'] == 1
+    assert result['bytes_reclaimed'] == 1
+    assert result['scanned'] == 0
+    assert list(storage.objects) == ['jobs/single/b/b.png']
+
+
+def test_cleanup_reindexes_batches_whose_delete_call_raises(monkeypatch) -> None:
+    class FlakyStorage(StubStorage):
+        def delete_objects(self, keys: list[str]) -> list[str]:
+            if 'jobs/single/a/a.png' in keys:
+                raise RuntimeError('S3 unavailable')
+            return super().delete_objects(keys)
+
+    class OneKeyBatches(StubExpiryIndex):
+        def pop_expired(self, now: float, limit: int = 1000) -> list[tuple[str, int]]:  # noqa: ARG002
+            return super().pop_expired(now, limit=1)
+
+    storage = FlakyStorage()
+    storage.objects = {'jobs/single/a/a.png': (b'a', 'image/png'), 'jobs/single/b/b.png': (b'b', 'image/png')}
+    index = OneKeyBatches()
+    index.register('jobs/single/a/a.png', 0, size=1)
+    index.register('jobs/single/b/b.png', 0, size=1)
+    monkeypatch.setattr(maintenance_jobs, 'storage', storage)
+    monkeypatch.setattr(maintenance_jobs, 'expiry_index', index)
+
+    result = maintenance_jobs.cleanup_expired_outputs_job(3600)
+
+    assert result['deleted'] == 1
+    assert result['failed'] == 1
+    assert list(storage.objects) == ['jobs/single/a/a.png']
+    assert list(index.entries) == ['jobs/single/a/a.png']
+
+
+def test_reconcile_keeps_listed_objects_the_index_still_holds(monkeypatch) -> None:
+    class ListingStorage(StubStorage):
+        def iter_job_objects(self, prefix: str):
+            uploaded = datetime(2020, 1, 1, tzinfo=timezone.utc)
+            for key, (data, _) in list(self.objects.items()):
+                if key.startswith(prefix):
+                    yield {'key': key, 'last_modified': uploaded, 'size': len(data)}
+
+    storage = ListingStorage()
+    storage.objects = {
+        'jobs/single/a/_source/cutout.png': (b'cut', 'image/png'),
+        'jobs/single/b/orphan.png': (b'old', 'image/png'),
+    }
+    index = StubExpiryIndex()
+    # A recent refine pushed the cached cutout's expiry out; its LastModified is still the upload time.
+    index.register('jobs/single/a/_source/cutout.png', 4_000_000_000, size=3)
+    monkeypatch.setattr(maintenance_jobs, 'storage', storage)
+    monkeypatch.setattr(maintenance_jobs, 'expiry_index', index)
+    monkeypatch.setattr(maintenance_jobs.settings, 'cleanup_prefixes', ('jobs/',))
+
+    result = maintenance_jobs.cleanup_expired_outputs_job(3600, reconcile=True)
+
+    assert result['deleted'] == 1
+    assert list(storage.objects) == ['jobs/single/a/_source/cutout.png']
+
+
+class StubMetricsRedis:
+    """The counter commands MetricsStore.flush() uses, recorded as pipelined."""
+
+    def __init__(self) -> None:
+        self.counters: dict[str, int] = {}
+
+    def pipeline(self, transaction=True):  # noqa: ARG002
+        return self
+
+    def hincrby(self, key, field, amount):
+        if key == 'rmbg:metrics:counters':
+            self.counters[field] = self.counters.get(field, 0) + amount
+
+    def execute(self):
+        return []
+
+
+def test_cleanup_counters_reach_the_shared_store(monkeypatch) -> None:
+    storage = StubStorage()
+    storage.objects = {'jobs/single/a/a.png': (b'a', 'image/png')}
+    index = StubExpiryIndex()
+    index.register('jobs/single/a/a.png', 0, size=1)
+    shared = StubMetricsRedis()
+    store = MetricsStore()
+    store.attach(shared, flush_interval=3600)
+    monkeypatch.setattr(maintenance_jobs, 'storage', storage)
+    monkeypatch.setattr(maintenance_jobs, 'expiry_index', index)
+    monkeypatch.setattr(maintenance_jobs, 'metrics', store)
+
+    maintenance_jobs.cleanup_expired_outputs_job(3600)
+
+    assert shared.counters['cleanup_objects_deleted_total'] == 1
+    assert shared.counters['cleanup_bytes_reclaimed_total'] == 1
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import worker
+
+
+def _desired(queue_depth: int, current: int, load_ratio: float = 0.2) -> int:
+    return worker.desired_worker_count(
+        queue_depth,
+        current,
+        load_ratio,
+        min_processes=1,
+        max_processes=4,
+        jobs_per_process=2,
+        cpu_headroom=0.15,
+    )
+
+
+def test_desired_worker_count_scales_with_queue_depth() -> None:
+    assert _desired(queue_depth=0, current=1) == 1
+    assert _desired(queue_depth=5, current=1) == 3
+    assert _desired(queue_depth=100, current=1) == 4
+
+
+def test_desired_worker_count_holds_without_cpu_headroom() -> None:
+    assert _desired(queue_depth=100, current=2, load_ratio=0.95) == 2
+
+
+def test_desired_worker_count_steps_down_one_at_a_time() -> None:
+    assert _desired(queue_depth=0, current=4) == 3
+
+
+def test_onnx_threads_never_oversubscribe_cores() -> None:
+    assert worker.onnx_threads_per_worker(max_processes=4, cpus=32) == 8
+    assert worker.onnx_threads_per_worker(max_processes=3, cpus=8) * 3 <= 8
+    assert worker.onnx_threads_per_worker(max_processes=16, cpus=4) == 1
+
+
+class FakeProcess:
+    def __init__(self, pid: int) -> None:
+        self.pid = pid
+        self.exitcode = None
+        self.alive = True
+
+    def is_alive(self) -> bool:
+        return self.alive
+
+    def join(self, timeout=None) -> None:  # noqa: ARG002
+        pass
+
+
+def test_recycled_slot_restarts_only_after_its_process_exits(monkeypatch) -> None:
+    signalled = []
+    monkeypatch.setattr(worker.settings, 'worker_max_rss_mb', 100)
+    monkeypatch.setattr(worker, 'process_rss_mb', lambda pid: 500 if pid == 1 else 50)
+    monkeypatch.setattr(worker.os, 'kill', lambda pid, signum: signalled.append(pid))  # noqa: ARG005
+    supervisor = worker.WorkerSupervisor([], min_processes=1, max_processes=2)
+    monkeypatch.setattr(supervisor, '_start', lambda slot: supervisor._slots.__setitem__(slot, FakeProcess(slot + 10)))
+    bloated = FakeProcess(1)
+    supervisor._slots = {1: bloated, 2: FakeProcess(2)}
+
+    supervisor._recycle_bloated()
+    supervisor._recycle_bloated()
+    supervisor._reap()
+
+    assert signalled == [1]
+    assert supervisor._slots[1] is bloated
+
+    bloated.alive = False
+    supervisor._reap()
+
+    assert supervisor._slots[1].pid == 11
+    assert len(supervisor._slots) == 2
+
+
+def test_worker_queue_names_do_not_depend_on_api_model_lanes(monkeypatch) -> None:
+    monkeypatch.setattr(worker.settings, 'model_lanes', ())
+    monkeypatch.setattr(worker.settings, 'worker_model_lanes', ('u2netp', 'isnet-general-use', 'u2netp'))
+
+    assert worker.worker_queue_names() == ['rmbg-u2netp', 'rmbg-isnet-general-use', 'rmbg']
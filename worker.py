@@ -1,53 +1,264 @@
 from __future__ import annotations
 
+import logging
+import math
 import multiprocessing
+import os
+import signal
 import threading
 import time
 
-from rq import Connection, Queue, Worker
+from rq import Connection, Queue, SimpleWorker, Worker
 
 from app.config import settings
 from app.infrastructure.jobs import get_redis_connection
+from app.infrastructure.leader import LeaderLease
+from app.infrastructure.process_stats import available_cpus, process_rss_mb
+
+logger = logging.getLogger("rmbg.worker")
+if not logger.handlers:
+    logging.basicConfig(level=logging.INFO)
+
+_CLEANUP_SCHEDULE_KEY = "rmbg:cleanup:schedule"
 
 
 class CleanupScheduler(threading.Thread):
+    """Enqueues cleanup jobs, but only on the host currently holding the cleanup lease."""
+
     def __init__(self, queue: Queue) -> None:
         super().__init__(daemon=True)
         self._queue = queue
+        self._connection = queue.connection
+        self._lease = LeaderLease(self._connection, "cleanup", settings.cleanup_leader_lease_seconds)
 
     def run(self) -> None:
+        # Renew well inside the lease so a live leader never lapses between ticks.
+        tick = max(1, settings.cleanup_leader_lease_seconds // 3)
         while True:
-            if settings.cleanup_enabled:
-                self._queue.enqueue(
-                    "app.tasks.maintenance_jobs.cleanup_expired_outputs_job",
-                    settings.cleanup_older_than_seconds,
-                    result_ttl=settings.job_result_ttl_seconds,
-                    failure_ttl=settings.job_failure_ttl_seconds,
-                )
-            time.sleep(max(60, settings.cleanup_interval_seconds))
+            try:
+                if settings.cleanup_enabled and self._lease.acquire_or_renew():
+                    self._maybe_enqueue()
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("cleanup scheduler tick failed: %s", exc)
+            time.sleep(tick)
+
+    def _maybe_enqueue(self) -> None:
+        # Run times live in Redis so a newly elected leader keeps the previous cadence.
+        now = time.time()
+        schedule = self._connection.hgetall(_CLEANUP_SCHEDULE_KEY)
+        last_run = float(schedule.get(b"last_run", 0))
+        last_reconcile = float(schedule.get(b"last_reconcile", 0))
+        if now - last_run < max(60, settings.cleanup_interval_seconds):
+            return
+
+        # The index handles routine expiry; a full listing only runs at the reconcile interval.
+        reconcile = now - last_reconcile >= settings.cleanup_reconcile_interval_seconds
+        self._queue.enqueue(
+            "app.tasks.maintenance_jobs.cleanup_expired_outputs_job",
+            settings.cleanup_older_than_seconds,
+            reconcile,
+            result_ttl=settings.job_result_ttl_seconds,
+            failure_ttl=settings.job_failure_ttl_seconds,
+        )
+        update = {"last_run": now}
+        if reconcile:
+            update["last_reconcile"] = now
+        self._connection.hset(_CLEANUP_SCHEDULE_KEY, mapping=update)
+
+
+def onnx_threads_per_worker(max_processes: int, cpus: int) -> int:
+    # Sized for the scale-out ceiling so a full fleet never oversubscribes the cores.
+    return max(1, cpus // max(1, max_processes))
+
+
+def desired_worker_count(
+    queue_depth: int,
+    current: int,
+    load_ratio: float,
+    min_processes: int,
+    max_processes: int,
+    jobs_per_process: int,
+    cpu_headroom: float,
+) -> int:
+    target = math.ceil(queue_depth / max(1, jobs_per_process))
+    target = max(min_processes, min(max_processes, target))
+    if target > current and load_ratio > 1.0 - cpu_headroom:
+        # No CPU left to give: another process would only slow the running ones down.
+        target = current
+    elif target < current:
+        # Step down one process per tick so a short lull does not collapse the pool.
+        target = current - 1
+    return max(min_processes, min(max_processes, target))
+
+
+def pin_to_cores(index: int, threads: int) -> list[int]:
+    cpus = sorted(os.sched_getaffinity(0))
+    width = max(1, min(threads, len(cpus)))
+    start = ((index - 1) * width) % len(cpus)
+    cores = (cpus + cpus)[start : start + width]
+    os.sched_setaffinity(0, cores)
+    return cores
+
+
+def worker_queue_names() -> list[str]:
+    # Dedicated model lanes first, so this pool prefers jobs for the models it keeps warm. The names are
+    # built here rather than with queue_name_for_model(), which consults the API-side MODEL_LANES.
+    lanes = [f"rmbg-{model}" for model in settings.worker_model_lanes]
+    return list(dict.fromkeys(lanes)) + ["rmbg"]
+
+
+def run_worker_instance(index: int, onnx_threads: int = 0) -> None:
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if onnx_threads > 0:
+        # build_session_options() sizes the onnxruntime intra-op pool from OMP_NUM_THREADS.
+        os.environ["OMP_NUM_THREADS"] = str(onnx_threads)
+        if settings.worker_cpu_affinity and hasattr(os, "sched_setaffinity"):
+            logger.info("worker slot %s pinned to cores %s", index, pin_to_cores(index, onnx_threads))
 
+    worker_class: type[Worker] = Worker
+    if settings.worker_in_process:
+        # Jobs run in this process, so sessions loaded here stay warm for every later job.
+        # A fork-per-job horse would reload the model each time; a crash is handled by the supervisor.
+        from app.tasks.background_jobs import remover
+
+        for model in settings.worker_model_lanes or (settings.rembg_default_model,):
+            try:
+                remover.warm(model)
+            except Exception as exc:  # noqa: BLE001
+                logger.warning("could not preload model %s: %s", model, exc)
+        worker_class = SimpleWorker
 
-def run_worker_instance(index: int) -> None:
     connection = get_redis_connection()
     with Connection(connection):
-        worker = Worker(["rmbg"], name=f"rmbg-worker-{index}")
+        worker = worker_class(worker_queue_names(), name=f"rmbg-worker-{index}-{os.getpid()}")
         worker.work()
 
 
+class WorkerSupervisor:
+    """Keeps between min and max rq worker processes alive and sized to the queue."""
+
+    def __init__(self, queues: list[Queue], min_processes: int, max_processes: int) -> None:
+        self._queues = queues
+        self._min_processes = max(1, min_processes)
+        self._max_processes = max(self._min_processes, max_processes)
+        self._cpus = available_cpus()
+        self._onnx_threads = settings.onnx_intra_op_threads or onnx_threads_per_worker(
+            self._max_processes, self._cpus
+        )
+        self._slots: dict[int, multiprocessing.Process] = {}
+        self._draining: list[multiprocessing.Process] = []
+        # Slots whose process was asked to exit for recycling; _reap refills them once it has.
+        self._recycling: set[int] = set()
+        self._stopping = threading.Event()
+
+    def request_stop(self, signum: int, frame) -> None:  # noqa: ARG002
+        logger.info("supervisor received signal %s, draining workers", signum)
+        self._stopping.set()
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        logger.info(
+            "supervisor starting: processes=%s..%s cpus=%s onnx_threads_per_worker=%s",
+            self._min_processes,
+            self._max_processes,
+            self._cpus,
+            self._onnx_threads,
+        )
+        while not self._stopping.is_set():
+            self._reconcile()
+            self._stopping.wait(max(1, settings.worker_scale_interval_seconds))
+        self._drain()
+
+    def _reconcile(self) -> None:
+        self._reap()
+        self._recycle_bloated()
+
+        try:
+            queue_depth = sum(queue.count for queue in self._queues)
+        except Exception as exc:  # noqa: BLE001
+            logger.warning("queue depth unavailable, holding pool size: %s", exc)
+            queue_depth = 0
+        current = len(self._slots)
+        load_ratio = os.getloadavg()[0] / self._cpus
+        desired = desired_worker_count(
+            queue_depth,
+            current,
+            load_ratio,
+            self._min_processes,
+            self._max_processes,
+            settings.worker_jobs_per_process,
+            settings.worker_cpu_headroom,
+        )
+        if desired != current:
+            logger.info("scaling workers %s -> %s (queue_depth=%s load=%.2f)", current, desired, queue_depth, load_ratio)
+
+        while len(self._slots) < desired:
+            slot = next(index for index in range(1, self._max_processes + 1) if index not in self._slots)
+            self._start(slot)
+        while len(self._slots) > desired:
+            self._retire(max(self._slots))
+
+    def _start(self, slot: int) -> None:
+        process = multiprocessing.Process(target=run_worker_instance, args=(slot, self._onnx_threads))
+        process.start()
+        self._slots[slot] = process
+
+    def _retire(self, slot: int) -> None:
+        process = self._slots.pop(slot)
+        self._recycling.discard(slot)
+        # SIGTERM is a warm shutdown for rq: the current job finishes before the worker exits.
+        if process.is_alive() and process.pid:
+            os.kill(process.pid, signal.SIGTERM)
+        self._draining.append(process)
+
+    def _reap(self) -> None:
+        self._draining = [process for process in self._draining if process.is_alive()]
+        for slot, process in list(self._slots.items()):
+            if process.is_alive():
+                continue
+            if slot in self._recycling:
+                self._recycling.discard(slot)
+                logger.info("worker slot %s recycled, starting a fresh process", slot)
+            else:
+                logger.warning("worker slot %s exited with code %s, restarting", slot, process.exitcode)
+            process.join(timeout=0)
+            self._start(slot)
+
+    def _recycle_bloated(self) -> None:
+        if settings.worker_max_rss_mb <= 0:
+            return
+        for slot, process in list(self._slots.items()):
+            if slot in self._recycling:
+                continue
+            rss_mb = process_rss_mb(process.pid or 0)
+            if rss_mb > settings.worker_max_rss_mb:
+                logger.warning("worker slot %s at %.0f MB RSS, recycling", slot, rss_mb)
+                # Warm shutdown only: the replacement starts after this process has exited, so the
+                # pool never holds max + 1 models in memory.
+                if process.is_alive() and process.pid:
+                    os.kill(process.pid, signal.SIGTERM)
+                self._recycling.add(slot)
+
+    def _drain(self) -> None:
+        for slot in list(self._slots):
+            self._retire(slot)
+        deadline = time.monotonic() + max(0, settings.worker_drain_timeout_seconds)
+        for process in self._draining:
+            process.join(timeout=max(0.0, deadline - time.monotonic()))
+        for process in self._draining:
+            if process.is_alive():
+                logger.warning("worker pid %s did not drain in time, killing", process.pid)
+                process.kill()
+                process.join()
+
+
 if __name__ == "__main__":
     main_connection = get_redis_connection()
     with Connection(main_connection):
         queue = Queue("rmbg", connection=main_connection)
         CleanupScheduler(queue).start()
 
-    worker_count = max(1, settings.worker_concurrency)
-    if worker_count == 1:
-        run_worker_instance(1)
-    else:
-        processes: list[multiprocessing.Process] = []
-        for idx in range(worker_count):
-            process = multiprocessing.Process(target=run_worker_instance, args=(idx + 1,))
-            process.start()
-            processes.append(process)
-        for process in processes:
-            process.join()
+    served_queues = [Queue(name, connection=main_connection) for name in worker_queue_names()]
+    WorkerSupervisor(served_queues, settings.worker_min_processes, settings.worker_max_processes).run()